@@ -0,0 +1,85 @@
+import os
+import json
+import time
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+from fetching.missy_fetching import (
+    get_distances,
+    get_clients,
+    get_mas,
+    get_prio_assignments,
+    get_schools,
+    filter_records_w_date,
+)
+from fetching.experience_logging import get_experience_log
+from data_processing.data_processor import DataProcessor
+from optimize.optimize import Optimizer
+from utils.daterange import daterange
+from utils.min_max_date import min_max_date
+from utils.read_file import read_file
+
+from config import base_url_missy
+
+# load .env file to environment
+load_dotenv(override=True)
+
+request_specs = os.getenv("REQUEST_INFO")
+request_specs = json.loads(request_specs)
+
+request_info = [{'user': spec['user'], 'pw': spec['pw'], 'url': base_url_missy.format(domain=spec['domain'])} for spec in request_specs]
+
+# Retrieve mostly static data
+distances = get_distances(request_info, use_cache=True)
+clients = get_clients(request_info, use_cache=True)
+mas = get_mas(request_info, use_cache=True)
+prio_assignments = get_prio_assignments(request_info)
+experience_log = get_experience_log()
+schools = get_schools(request_info)
+global_schools_mapping = {school.get("id", None): school.get("systemuebergreifendeid", None) for school in schools}
+
+backends = ["cpmpy", "ortools", "auto"]
+
+
+def main():
+    '''
+    Solve every recorded day of data/vertretungsfall_all.json with all solver
+    backends and check that they reach the same objective value.
+    '''
+    vertretungen = read_file("vertretungsfall_all")
+    data_processor = DataProcessor(
+        mas, clients, prio_assignments, distances, experience_log, global_schools_mapping
+    )
+
+    min_date, max_date = min_max_date(vertretungen)
+    mismatches = []
+
+    for current_date in daterange(min_date, max_date + timedelta(days=1)):
+        date_str = current_date.strftime("%Y-%m-%d")
+        day_vertretungen = filter_records_w_date(vertretungen, date_str)
+        if not day_vertretungen:
+            continue
+
+        clients_df, mas_df, _ = data_processor.create_optimization_dataset(
+            day_vertretungen, datetime.strptime(date_str, "%Y-%m-%d")
+        )
+
+        objective_values = {}
+        for backend in backends:
+            start = time.perf_counter()
+            optimizer = Optimizer(mas_df, clients_df, None, solver_backend=backend)
+            optimizer.create_model()
+            objective_values[backend] = optimizer.solve_model()
+            print(f"{date_str} {backend}: {objective_values[backend]} ({time.perf_counter() - start:.3f} s)")
+
+        if len(set(objective_values.values())) > 1:
+            mismatches.append((date_str, objective_values))
+
+    if mismatches:
+        print(f"Objective values differ on {len(mismatches)} days: {mismatches}")
+    else:
+        print("All backends reach the same objective values")
+
+
+if __name__ == "__main__":
+    main()
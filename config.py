@@ -4,8 +4,55 @@ base_url_missy = "https://{domain}.evabrain.de/webservice-1/"
 base_url_ai = "https://{system_spec}.evabrain.de/webservice-2/"
 
 log_store = "store"
+# Size in bytes after which a JSON Lines log in the log store is rotated (0 to disable) and whether rotated logs are gzip compressed
+log_rotate_bytes = 50 * 1024 * 1024
+log_compress_rotated = True
+
+# Maximum number of Missy domains fetched concurrently and request timeout in seconds
+fetch_max_workers = 8
+fetch_timeout = 60
+# Maximum number of concurrent recommendation pushes per domain and number of
+# changed recommendations pushed per batch
+push_max_concurrency = 8
+push_batch_size = 25
+# Retries of failed requests (connection errors, timeouts, 429 and 5xx) with
+# exponential backoff starting at request_backoff seconds
+request_retries = 3
+request_backoff = 0.5
+
+# Time to live in seconds of the cached static endpoints (see endpoints.py). Expired
+# endpoints are revalidated in the background while the previous snapshot is served
+endpoint_cache_ttls = {
+    "dist_ma_sch": 24 * 60 * 60,
+    "school": 24 * 60 * 60,
+    "klient": 60 * 60,
+    "ma": 60 * 60,
+}
+endpoint_cache_default_ttl = 60 * 60
+
+# Interval in seconds in which the main loop reloads the master data
+master_data_refresh_interval = 60 * 60
 
 include_abnormality = False
+# Threads scoring the abnormality of the MA-client pairs, each scoring one chunk of the pairs
+abnormality_score_workers = 1
+
+# Solver for the assignment model: "auto" solves pure assignment problems with the
+# Hungarian method (scipy) and falls back to OR-Tools for side constraints, "cpmpy"
+# always uses OR-Tools via cpmpy, "ortools" builds the model directly in CP-SAT
+solver_backend = "auto"
+
+# Solve budget for OR-Tools: time limit in seconds (None for no limit), number of
+# parallel search workers and relative gap at which a feasible solution is accepted
+solver_time_limit = 10
+solver_num_workers = 8
+solver_relative_gap = 0.0
+
+# Split the assignment problem into the connected components of the MA-client
+# eligibility graph and solve them separately ("auto" and "ortools" backends without
+# side constraints). More than one worker solves the components in a process pool
+solver_decompose = True
+solver_decomposition_workers = 1
 
 # Set to False for a live test today
 relevant_date_test = "2025-11-25"
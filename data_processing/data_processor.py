@@ -1,7 +1,16 @@
-from typing import List, Tuple, Dict
+from typing import Callable, List, Tuple, Dict
+from datetime import datetime
+import hashlib
+import json
+import pandas as pd
 
-from data_processing.features_retrieval.client_features import aggregate_client_features
+from data_processing.features_retrieval.client_features import (
+    aggregate_client_features,
+    build_prio_index,
+)
 from data_processing.features_retrieval.ma_features import aggregate_ma_features
+from data_processing.features_retrieval.distance_index import DistanceIndex
+from data_processing.features_retrieval.experience_store import ExperienceStore
 from data_processing.features_retrieval.filter_mabw_records import filter_mabw_records
 from data_processing.features_retrieval.filter_kabw_records import filter_kabw_records
 from data_processing.features_retrieval.retrieve_ids import (
@@ -9,7 +18,10 @@ from data_processing.features_retrieval.retrieve_ids import (
     get_open_client_ids,
     get_free_ma_ids,
 )
-from data_processing.features_retrieval.retrieve_objects import get_objects_by_id
+from data_processing.features_retrieval.retrieve_objects import (
+    build_id_index,
+    get_objects_by_id,
+)
 
 
 class DataProcessor:
@@ -23,6 +35,32 @@ class DataProcessor:
         experience_log,
         global_schools_mapping,
     ) -> None:
+        self.set_master_data(
+            mas,
+            clients,
+            prio_assignments,
+            distances,
+            experience_log,
+            global_schools_mapping,
+        )
+
+        # Feature rows of the relevant date, keyed by client / MA id, so that
+        # polls only compute the features of new clients and MAs
+        self.feature_cache_date = None
+        self.clients_signature = None
+        self.client_feature_cache = {}
+        self.ma_feature_cache = {}
+
+    def set_master_data(
+        self,
+        mas,
+        clients,
+        prio_assignments,
+        distances,
+        experience_log,
+        global_schools_mapping,
+    ) -> None:
+        """Replace the master data, e.g. with a snapshot reloaded by the MasterDataStore."""
         self.mas = mas
         self.clients = clients
 
@@ -31,6 +69,15 @@ class DataProcessor:
         self.experience_log = experience_log
         self.global_schools_mapping = global_schools_mapping
 
+        # Lookup indexes, built once per master data snapshot
+        self.client_index = build_id_index(clients)
+        self.ma_index = build_id_index(mas)
+        self.prio_index = build_prio_index(prio_assignments)
+        self.distance_index = DistanceIndex.load_or_build(distances, global_schools_mapping)
+        self.experience_store = ExperienceStore.load_or_build(experience_log)
+
+        self.clear_feature_cache()
+
     def get_mabw_records(self, vertretungen: List) -> Dict:
 
         filtered_mabw_records = filter_mabw_records(vertretungen)
@@ -49,26 +96,143 @@ class DataProcessor:
 
     def create_day_dataset(self, clients, mas, date: str):
 
-        open_client_objects = get_objects_by_id(self.clients, clients)
-        free_ma_objects = get_objects_by_id(self.mas, mas)
+        open_client_objects = get_objects_by_id(self.clients, clients, self.client_index)
+        free_ma_objects = get_objects_by_id(self.mas, mas, self.ma_index)
+
+        date_str = date.strftime("%Y-%m-%d")
+        if date_str != self.feature_cache_date:
+            self.clear_feature_cache()
+            self.feature_cache_date = date_str
 
-        clients_df, clients_dict = aggregate_client_features(
+        clients_df, clients_dict = self._get_cached_features(
+            self.client_feature_cache,
             open_client_objects,
-            date,
-            self.prio_assignments,
-            self.global_schools_mapping,
+            lambda objects: aggregate_client_features(
+                objects,
+                date,
+                self.prio_assignments,
+                self.global_schools_mapping,
+                self.prio_index,
+            ),
         )
-        mas_df, mas_dict = aggregate_ma_features(
+
+        # MA features depend on the set of open clients and their schools
+        clients_signature = hashlib.sha1(
+            json.dumps([clients_dict["id"], clients_dict["school"]], default=str).encode("utf-8")
+        ).hexdigest()
+        if clients_signature != self.clients_signature:
+            self.ma_feature_cache = {}
+            self.clients_signature = clients_signature
+
+        mas_df, mas_dict = self._get_cached_features(
+            self.ma_feature_cache,
             free_ma_objects,
-            self.distances,
-            clients_dict,
-            self.experience_log,
-            date.strftime("%Y-%m-%d"),
-            self.global_schools_mapping,
+            lambda objects: aggregate_ma_features(
+                objects,
+                self.distances,
+                clients_dict,
+                self.experience_log,
+                date_str,
+                self.global_schools_mapping,
+                self.distance_index,
+                self.experience_store,
+            ),
         )
 
         return clients_df, mas_df
 
+    def clear_feature_cache(self) -> None:
+        """Drop all cached feature rows, e.g. after the master data changed."""
+        self.clients_signature = None
+        self.client_feature_cache = {}
+        self.ma_feature_cache = {}
+
+    def _get_cached_features(
+        self, cache: Dict, objects: List, aggregate: Callable
+    ) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Assemble the features of the objects, computing only those not in the cache.
+
+        Args:
+            cache: Feature rows keyed by object id
+            objects: Client or MA objects, in the order of the resulting rows
+            aggregate: Feature function returning a DataFrame and a dict of columns
+        """
+        missing_objects = [obj for obj in objects if obj["id"] not in cache]
+        _, missing_dict = aggregate(missing_objects)
+        for k, obj in enumerate(missing_objects):
+            cache[obj["id"]] = {column: values[k] for column, values in missing_dict.items()}
+
+        feature_dict = {
+            column: [cache[obj["id"]][column] for obj in objects]
+            for column in missing_dict
+        }
+
+        return pd.DataFrame.from_dict(feature_dict), feature_dict
+
+    def create_optimization_dataset(
+        self, vertretungen: List, date: datetime
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Dict]]:
+        """
+        Create the MA and client features of all free MAs and open clients of a day.
+
+        Returns:
+            Tuple of the client features, the MA features and the incident
+            assignments of the open clients
+        """
+        mabw_records = self.get_mabw_records(vertretungen)
+        open_client_records = mabw_records["open_clients"]
+        rescheduled_ma_records = mabw_records["rescheduled_mas"]
+
+        ma_assignments = self.get_ma_assignments(rescheduled_ma_records)
+        assigned_mas = list(ma_assignments.keys())
+        print("assigned_mas: ", assigned_mas)
+        kabw_records = self.get_kabw_records(vertretungen, assigned_mas)
+
+        print("kabw_records: ", kabw_records)
+
+        client_record_assignments = self.get_client_record_assignments(
+            open_client_records
+        )
+
+        print("client_record_assignments: ", client_record_assignments)
+
+        absent_client_records = kabw_records["absent_clients"]
+        free_ma_records = kabw_records["free_mas"]
+
+        print("Records extrahiert")
+
+        open_client_ids = get_open_client_ids(open_client_records)
+        free_ma_ids = get_free_ma_ids(free_ma_records, absent_client_records, self.mas)
+        free_ma_ids_only = list(map(lambda x: x["id"], free_ma_ids))
+        open_client_ids_only = list(map(lambda x: x["id"], open_client_ids))
+
+        print("ids gesammelt")
+
+        clients_df, mas_df = self.create_day_dataset(
+            open_client_ids_only, free_ma_ids_only, date
+        )
+
+        # Add the columns "available_until" and "ma_blacklist" based on the free_ma_ids and
+        # open_client_ids in the form {"id": "123", "until": "2025-01-01"}, looked up by id
+        # (the first item of an id wins)
+        ma_until = {}
+        for item in free_ma_ids:
+            ma_until.setdefault(item["id"], item["until"])
+        client_until = {}
+        client_blacklist = {}
+        for item in open_client_ids:
+            client_until.setdefault(item["id"], item["until"])
+            client_blacklist.setdefault(item["id"], item["ma_blacklist"])
+
+        mas_df["available_until"] = mas_df["id"].map(ma_until.get)
+        clients_df["available_until"] = clients_df["id"].map(client_until.get)
+        clients_df["ma_blacklist"] = clients_df["id"].map(client_blacklist.get)
+
+        print("ma- und klientendatenframes erstellt")
+
+        return clients_df, mas_df, client_record_assignments
+
     def get_open_clients_and_mas(
         self, vertretungen: List, assigned_mas: List, open_client_records: List
     ) -> Tuple[List, List]:
@@ -4,7 +4,7 @@ import pandas as pd
 from utils.get_weekday import get_weekday
 from utils.add_comment import add_customer_comment
 
-def aggregate_client_features(open_client_objects: List, date: datetime, prio_assignments: List, global_schools_mapping: Dict):
+def aggregate_client_features(open_client_objects: List, date: datetime, prio_assignments: List, global_schools_mapping: Dict, prio_index: Dict = None):
     client_dict = {
         "id": [],
         "neededQualifications": [],
@@ -23,7 +23,7 @@ def aggregate_client_features(open_client_objects: List, date: datetime, prio_as
         client_dict["requiredSex"].append(client.get("begleitergeschlecht"))
         client_dict["timeWindow"].append(get_timewindow(client, weekday)) 
         priority_id = client.get("vertretungab")["id"] if client.get("vertretungab") != None else 100       
-        client_dict["priority"].append(convert_priority(prio_assignments, priority_id))
+        client_dict["priority"].append(convert_priority(prio_assignments, priority_id, prio_index))
         global_school_id = global_schools_mapping.get(client.get("schule", {}).get("id", None), None)
         client_dict["school"].append(global_school_id)
         
@@ -54,9 +54,18 @@ def get_timewindow(client, weekday):
     
     return (start_as_float, end_as_float)
 
-def convert_priority(prio_assignments, priority_id):
+def build_prio_index(prio_assignments):
+    # Order of every priority id, the first assignment with an id wins
+    prio_index = {}
+    for item in prio_assignments:
+        prio_index.setdefault(item.get('id'), item.get('reihenfolge', 100))
+    return prio_index
+
+def convert_priority(prio_assignments, priority_id, prio_index=None):
     if priority_id == None:
         return 100
+    elif prio_index is not None:
+        return prio_index.get(priority_id, 100)
     else:
         for item in prio_assignments:
             if item.get('id') == priority_id:
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+distance_index_file = "data/dist_ma_sch_index.npz"
+
+
+class DistanceIndex:
+    """
+    Dense MA x school matrix of the linear distances of MASchuleDistanzGMap.
+
+    Schools are keyed by their global id. As in the per-MA lookup it
+    replaces, the first distance row of an (MA, school) pair wins. Missing
+    pairs and rows without distance are NaN.
+    """
+
+    def __init__(self, ma_ids: List, school_ids: List, matrix: np.ndarray, source: Dict = None):
+        self.ma_ids = ma_ids
+        self.school_ids = school_ids
+        self.matrix = matrix
+        self.source = source or {}
+        self.ma_position = {ma_id: k for k, ma_id in enumerate(ma_ids)}
+        self.school_position = {school_id: k for k, school_id in enumerate(school_ids)}
+
+    @classmethod
+    def build(cls, distances: List[Dict], global_schools_mapping: Dict, source: Dict = None) -> "DistanceIndex":
+        """Build the index with one pass over the distance rows."""
+        ma_position = {}
+        school_position = {}
+        rows = []
+        columns = []
+        values = []
+        for distance in distances:
+            school_id = global_schools_mapping.get(distance["schule"]["id"], None)
+            if school_id is None:
+                continue
+            rows.append(ma_position.setdefault(distance["mitarbeiterin"]["id"], len(ma_position)))
+            columns.append(school_position.setdefault(school_id, len(school_position)))
+            dist = distance.get("einfachdistanzluft")
+            values.append(np.nan if dist is None else dist)
+
+        matrix = np.full((len(ma_position), len(school_position)), np.nan)
+        if rows:
+            # Keep the first row of every (MA, school) pair
+            cells = np.array(rows) * len(school_position) + np.array(columns)
+            _, first = np.unique(cells, return_index=True)
+            matrix.flat[cells[first]] = np.array(values, dtype=float)[first]
+
+        return cls(list(ma_position), list(school_position), matrix, source)
+
+    @classmethod
+    def load_or_build(
+        cls,
+        distances: List[Dict],
+        global_schools_mapping: Dict,
+        path: str = distance_index_file,
+    ) -> "DistanceIndex":
+        """
+        Load the index persisted next to data/dist_ma_sch.json, or build and persist it.
+
+        The persisted index is only used if it was built from the same
+        distance rows and school mapping.
+        """
+        source = _source_signature(distances, global_schools_mapping)
+        if os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if index.source == source:
+                    return index
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Could not load distance index {path}: {e}")
+
+        index = cls.build(distances, global_schools_mapping, source)
+        if os.path.isdir(os.path.dirname(path) or "."):
+            index.save(path)
+
+        return index
+
+    @classmethod
+    def load(cls, path: str = distance_index_file) -> "DistanceIndex":
+        with np.load(path) as data:
+            return cls(
+                json.loads(str(data["ma_ids"])),
+                json.loads(str(data["school_ids"])),
+                data["matrix"],
+                json.loads(str(data["source"])),
+            )
+
+    def save(self, path: str = distance_index_file) -> None:
+        np.savez_compressed(
+            path,
+            ma_ids=np.array(json.dumps(self.ma_ids)),
+            school_ids=np.array(json.dumps(self.school_ids)),
+            matrix=self.matrix,
+            source=np.array(json.dumps(self.source)),
+        )
+
+    def distances_to_schools(self, ma_id: str, school_ids: List) -> np.ndarray:
+        """Distances of an MA to the given schools, NaN where unknown."""
+        result = np.full(len(school_ids), np.nan)
+        row = self.ma_position.get(ma_id)
+        if row is None:
+            return result
+
+        positions = np.array([self.school_position.get(school_id, -1) for school_id in school_ids], dtype=int)
+        known = positions >= 0
+        result[known] = self.matrix[row, positions[known]]
+
+        return result
+
+
+def _source_signature(distances: List[Dict], global_schools_mapping: Dict) -> Dict:
+    """Identify the distance rows and school mapping an index was built from."""
+    # Hash the fields the index is built from, the rows passed in may differ
+    # from the cached file (e.g. fetched without cache or not yet written)
+    rows = [
+        (distance["mitarbeiterin"]["id"], distance["schule"]["id"], distance.get("einfachdistanzluft"))
+        for distance in distances
+    ]
+
+    return {
+        "distances": hashlib.sha1(json.dumps(rows, default=str).encode("utf-8")).hexdigest(),
+        "rows": len(distances),
+        "schools_mapping": hashlib.sha1(
+            json.dumps(sorted(global_schools_mapping.items(), key=str), default=str).encode("utf-8")
+        ).hexdigest(),
+    }
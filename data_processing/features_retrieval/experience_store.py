@@ -0,0 +1,303 @@
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+
+from utils.file_fingerprint import file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+experience_log_file = "data/experience_log.json"
+experience_store_file = "data/experience_store.npz"
+
+# Bits of the day ordinal in the int64 (pair, day) search key of a row
+_day_bits = 32
+
+
+class ExperienceTable:
+    """
+    Experience dates of (MA, key) pairs, key being a client or school id.
+
+    Rows are sorted by MA, key and day. Every (MA, key) pair is a
+    contiguous block of rows, so its total count is the block length and
+    the count within a date window is a binary search in its sorted days.
+    """
+
+    def __init__(self, ma_codes: np.ndarray, key_codes: np.ndarray, days: np.ndarray, keys: List):
+        order = np.lexsort((days, key_codes, ma_codes))
+        self.ma_codes = ma_codes = ma_codes[order]
+        self.key_codes = key_codes = key_codes[order]
+        self.days = days[order]
+
+        self.keys = keys
+        self.key_position = {key: k for k, key in enumerate(keys)}
+
+        # Blocks of (MA, key) pairs
+        is_start = np.ones(len(ma_codes), dtype=bool)
+        is_start[1:] = (ma_codes[1:] != ma_codes[:-1]) | (key_codes[1:] != key_codes[:-1])
+        self.pair_start = np.flatnonzero(is_start)
+        self.pair_end = np.append(self.pair_start[1:], len(ma_codes))
+        self.pair_key = key_codes[self.pair_start]
+        self.pair_ma = ma_codes[self.pair_start]
+
+        row_pair = np.repeat(np.arange(len(self.pair_start)), self.pair_end - self.pair_start)
+        self.row_keys = (row_pair.astype(np.int64) << _day_bits) + self.days
+
+    def counts(self, keys: List, since_day: int = None) -> Dict[int, Dict]:
+        """
+        Number of experience dates per MA and key, for the pairs with any experience.
+
+        Args:
+            keys: Client or school ids to count, the counts of every MA
+                follow their order
+            since_day: If given, only dates on or after this day ordinal are
+                counted (pairs with experience outside the window count 0)
+
+        Returns:
+            {ma code: {key: count}}
+        """
+        key_order = {}
+        for key in keys:
+            key_code = self.key_position.get(key)
+            if key_code is not None:
+                key_order.setdefault(key_code, len(key_order))
+        if not key_order:
+            return {}
+
+        order_of_key = np.full(len(self.keys), -1)
+        order_of_key[list(key_order)] = np.arange(len(key_order))
+        order_of_pair = order_of_key[self.pair_key]
+        pairs = np.flatnonzero(order_of_pair >= 0)
+        pairs = pairs[np.lexsort((order_of_pair[pairs], self.pair_ma[pairs]))]
+
+        if since_day is None:
+            counts = self.pair_end[pairs] - self.pair_start[pairs]
+        else:
+            window_start = np.searchsorted(
+                self.row_keys, (pairs.astype(np.int64) << _day_bits) + since_day
+            )
+            counts = self.pair_end[pairs] - np.maximum(window_start, self.pair_start[pairs])
+
+        result = {}
+        for ma_code, key_code, count in zip(
+            self.pair_ma[pairs].tolist(), self.pair_key[pairs].tolist(), counts.tolist()
+        ):
+            result.setdefault(ma_code, {})[self.keys[key_code]] = count
+
+        return result
+
+    def pair_counts(self, ma_codes: np.ndarray, keys: List, since_days: np.ndarray = None) -> np.ndarray:
+        """
+        Number of experience dates of many (MA, key) rows at once.
+
+        Args:
+            ma_codes: MA code of every row, -1 for MAs without experience
+            keys: Client or school id of every row
+            since_days: Optional day ordinal per row, only dates on or after it are counted
+
+        Returns:
+            Count of every row, 0 for pairs without experience
+        """
+        ma_codes = np.asarray(ma_codes, dtype=np.int64)
+        key_codes = np.array([self.key_position.get(key, -1) for key in keys], dtype=np.int64)
+        counts = np.zeros(len(ma_codes), dtype=np.int64)
+        if len(self.pair_start) == 0 or len(ma_codes) == 0:
+            return counts
+
+        # Pairs are sorted by MA and key, so their combined code is sorted as well
+        pair_codes = self.pair_ma * len(self.keys) + self.pair_key
+        row_codes = ma_codes * len(self.keys) + key_codes
+        pairs = np.minimum(np.searchsorted(pair_codes, row_codes), len(pair_codes) - 1)
+        found = (ma_codes >= 0) & (key_codes >= 0) & (pair_codes[pairs] == row_codes)
+        pairs = pairs[found]
+
+        if since_days is None:
+            counts[found] = self.pair_end[pairs] - self.pair_start[pairs]
+        else:
+            window_start = np.searchsorted(
+                self.row_keys,
+                (pairs.astype(np.int64) << _day_bits) + np.asarray(since_days, dtype=np.int64)[found],
+            )
+            counts[found] = self.pair_end[pairs] - np.maximum(window_start, self.pair_start[pairs])
+
+        return counts
+
+
+class ExperienceStore:
+    """
+    Columnar store of the experience log.
+
+    Holds (MA, client, day) and (MA, school, day) rows as integer arrays
+    instead of nested dictionaries with ISO date strings. Experience
+    counts of an MA are computed from the sorted arrays.
+    """
+
+    def __init__(self, ma_ids: List, client_table: ExperienceTable, school_table: ExperienceTable, source: Dict = None):
+        self.ma_ids = ma_ids
+        self.ma_position = {ma_id: k for k, ma_id in enumerate(ma_ids)}
+        self.client_table = client_table
+        self.school_table = school_table
+        self.source = source or {}
+
+    @classmethod
+    def from_log(cls, experience_log: List[Dict], source: Dict = None) -> "ExperienceStore":
+        """Build the store from the entries of data/experience_log.json."""
+        ma_position = {}
+        columns = {"client_experience": ([], [], []), "school_experience": ([], [], [])}
+        for entry in experience_log or []:
+            # As with a linear search, the first entry of an MA wins
+            if entry["ma"] in ma_position:
+                continue
+            ma_code = ma_position.setdefault(entry["ma"], len(ma_position))
+            for field, (ma_codes, keys, dates) in columns.items():
+                for key, key_dates in entry.get(field, {}).items():
+                    ma_codes.extend([ma_code] * len(key_dates))
+                    keys.extend([key] * len(key_dates))
+                    dates.extend(key_dates)
+
+        tables = [
+            _build_table(ma_codes, keys, dates)
+            for ma_codes, keys, dates in columns.values()
+        ]
+
+        return cls(list(ma_position), *tables, source)
+
+    @classmethod
+    def load_or_build(cls, experience_log: List[Dict], path: str = experience_store_file) -> "ExperienceStore":
+        """
+        Load the store persisted next to data/experience_log.json, or migrate the log into it.
+
+        The persisted store is only used if it was built from the current
+        version of the experience log file.
+        """
+        source = _source_signature(experience_log)
+        if source is not None and os.path.exists(path):
+            try:
+                store = cls.load(path)
+                if store.source == source:
+                    return store
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Could not load experience store {path}: {e}")
+
+        store = cls.from_log(experience_log, source)
+        if source is not None:
+            store.save(path)
+
+        return store
+
+    @classmethod
+    def load(cls, path: str = experience_store_file) -> "ExperienceStore":
+        with np.load(path) as data:
+            ma_ids = json.loads(str(data["ma_ids"]))
+            tables = [
+                ExperienceTable(
+                    data[f"{name}_ma_codes"],
+                    data[f"{name}_key_codes"],
+                    data[f"{name}_days"],
+                    json.loads(str(data[f"{name}_keys"])),
+                )
+                for name in ("client", "school")
+            ]
+            return cls(ma_ids, *tables, json.loads(str(data["source"])))
+
+    def save(self, path: str = experience_store_file) -> None:
+        arrays = {}
+        for name, table in (("client", self.client_table), ("school", self.school_table)):
+            arrays[f"{name}_ma_codes"] = table.ma_codes
+            arrays[f"{name}_key_codes"] = table.key_codes
+            arrays[f"{name}_days"] = table.days
+            arrays[f"{name}_keys"] = np.array(json.dumps(table.keys))
+
+        np.savez_compressed(
+            path,
+            ma_ids=np.array(json.dumps(self.ma_ids)),
+            source=np.array(json.dumps(self.source)),
+            **arrays,
+        )
+
+    def get_experiences(self, ma_id: str, clients_dict: Dict, date: str) -> Dict[str, Dict]:
+        """Experience counts of a single MA, see get_experiences_many."""
+        return self.get_experiences_many([ma_id], clients_dict, date)[ma_id]
+
+    def get_experiences_many(self, ma_ids: List[str], clients_dict: Dict, date: str) -> Dict[str, Dict]:
+        """
+        Client, short-term client (last two weeks) and school experience counts of MAs.
+
+        Matches get_experiences of ma_features on the experience log list,
+        but counts all MAs at once.
+
+        Returns:
+            {ma_id: {"client_experience": ..., "short_term_client_experience": ..., "school_experience": ...}}
+        """
+        two_weeks_ago = (datetime.strptime(date, "%Y-%m-%d") - timedelta(weeks=2)).date()
+        counts = {
+            "client_experience": self.client_table.counts(clients_dict["id"]),
+            "short_term_client_experience": self.client_table.counts(
+                clients_dict["id"], since_day=_day_ordinal(two_weeks_ago)
+            ),
+            "school_experience": self.school_table.counts(clients_dict.get("school")),
+        }
+
+        experiences = {}
+        for ma_id in ma_ids:
+            ma_code = self.ma_position.get(ma_id)
+            experiences[ma_id] = {
+                field: field_counts.get(ma_code, {}) if ma_code is not None else {}
+                for field, field_counts in counts.items()
+            }
+
+        return experiences
+
+    def get_pair_experiences(self, ma_ids: List[str], client_ids: List[str], school_ids: List, days: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Client, short-term client and school experience counts of (MA, client, day) rows.
+
+        Row-wise counterpart of get_experiences_many, e.g. for building
+        training data over many days at once.
+
+        Args:
+            ma_ids: MA id of every row
+            client_ids: Client id of every row
+            school_ids: School id of the client of every row
+            days: Day ordinal of every row
+
+        Returns:
+            {"client_experience": ..., "short_term_client_experience": ..., "school_experience": ...}
+        """
+        ma_codes = np.array([self.ma_position.get(ma_id, -1) for ma_id in ma_ids], dtype=np.int64)
+        two_weeks_ago = np.asarray(days, dtype=np.int64) - 14
+
+        return {
+            "client_experience": self.client_table.pair_counts(ma_codes, client_ids),
+            "short_term_client_experience": self.client_table.pair_counts(ma_codes, client_ids, two_weeks_ago),
+            "school_experience": self.school_table.pair_counts(ma_codes, school_ids),
+        }
+
+
+def _day_ordinal(date) -> int:
+    return int(np.datetime64(date, "D").astype(np.int64))
+
+
+def _build_table(ma_codes: List[int], keys: List, dates: List[str]) -> ExperienceTable:
+    key_position = {}
+    key_codes = np.array([key_position.setdefault(key, len(key_position)) for key in keys], dtype=np.int64)
+    days = np.array(dates, dtype="datetime64[D]").astype(np.int64)
+
+    return ExperienceTable(
+        np.array(ma_codes, dtype=np.int64), key_codes, days, list(key_position)
+    )
+
+
+def _source_signature(experience_log: List[Dict]) -> Dict | None:
+    """Identify the experience log file a store was built from."""
+    if not os.path.exists(experience_log_file):
+        return None
+
+    return {
+        # Content hash, an in-place rewrite can keep mtime and size
+        "sha1": file_fingerprint(experience_log_file),
+        "entries": len(experience_log or []),
+    }
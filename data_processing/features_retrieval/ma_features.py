@@ -4,7 +4,10 @@ import json
 import pandas as pd
 from utils.add_comment import add_employee_comment
 
-def aggregate_ma_features(ma_objects: List, distances: List, clients_dict: Dict, experience_log: List, date: str, global_schools_mapping: Dict) -> Tuple[pd.DataFrame, Dict]:
+# Schools further away than this linear distance (in meters) are not reachable
+max_commute_distance = 60000
+
+def aggregate_ma_features(ma_objects: List, distances: List, clients_dict: Dict, experience_log: List, date: str, global_schools_mapping: Dict, distance_index=None, experience_store=None) -> Tuple[pd.DataFrame, Dict]:
     ma_dict = {
         "id": [],
         "qualifications": [],
@@ -16,16 +19,23 @@ def aggregate_ma_features(ma_objects: List, distances: List, clients_dict: Dict,
         "timeToSchool": [],
         "availability": [],
     }
+    if experience_store is not None:
+        store_experiences = experience_store.get_experiences_many(
+            [ma["id"] for ma in ma_objects], clients_dict, date
+        )
     for ma in ma_objects:
         ma_dict["id"].append(ma["id"])
         ma_dict["qualifications"].append(get_ma_qualifications(ma))
         # TODO Implement
         ma_dict["sex"].append(None)
-        experiences = get_experiences(ma["id"], clients_dict, experience_log, date)
+        if experience_store is not None:
+            experiences = store_experiences[ma["id"]]
+        else:
+            experiences = get_experiences(ma["id"], clients_dict, experience_log, date)
         ma_dict["cl_experience"].append(experiences["client_experience"])
         ma_dict["school_experience"].append(experiences["school_experience"])
         ma_dict["short_term_cl_experience"].append(experiences["short_term_client_experience"])
-        commute_time = create_commute_info(ma["id"], clients_dict, distances, global_schools_mapping)
+        commute_time = create_commute_info(ma["id"], clients_dict, distances, global_schools_mapping, distance_index)
         ma_dict["timeToSchool"].append(json.dumps(commute_time))
         ma_dict["hasCar"].append(get_mobility(ma))        
         ma_dict["availability"].append(get_ma_availability(ma))
@@ -142,7 +152,10 @@ def prepare_distances(distances, ma_id, global_schools_mapping: Dict):
     
     return distance_dict
     
-def create_commute_info(ma_id: str, clients: dict, distances: list, global_schools_mapping: Dict):
+def create_commute_info(ma_id: str, clients: dict, distances: list, global_schools_mapping: Dict, distance_index=None):
+    if distance_index is not None:
+        return create_commute_info_from_index(ma_id, clients, distance_index)
+
     # Preprocess the distances into a dictionary for faster lookups
     distance_dict = prepare_distances(distances, ma_id, global_schools_mapping)
     
@@ -154,7 +167,7 @@ def create_commute_info(ma_id: str, clients: dict, distances: list, global_schoo
         if school_prefix in distance_dict:
             dist_data = distance_dict[school_prefix]
             dist = dist_data.get("einfachdistanzluft")
-            if dist is not None and dist < 60000:
+            if dist is not None and dist < max_commute_distance:
                 result[school_prefix] = dist
 
     # if len(result) == 0:
@@ -165,6 +178,18 @@ def create_commute_info(ma_id: str, clients: dict, distances: list, global_schoo
 
     return result
 
+def create_commute_info_from_index(ma_id: str, clients: dict, distance_index):
+    # Unique schools of the clients, in order of their first appearance
+    school_ids = [school_id for school_id in dict.fromkeys(clients["school"]) if school_id is not None]
+    dists = distance_index.distances_to_schools(ma_id, school_ids)
+    reachable = dists < max_commute_distance  # False for unknown (NaN) distances
+
+    return {
+        school_id: dist.item()
+        for school_id, dist, is_reachable in zip(school_ids, dists, reachable)
+        if is_reachable
+    }
+
 def get_mobility(ma):
     if ma.get("mobilitaet") != None and ma["mobilitaet"] != []:
         return True
@@ -1,7 +1,33 @@
-from typing import List
+from typing import Dict, List
 
-def get_objects_by_id(objects: List, object_ids: List) -> List:
+def build_id_index(objects: List) -> Dict[str, List[int]]:
     
-    filtered_clients = [obj for obj in objects if obj.get('id') in object_ids]
+    # Positions of all objects per id, in the order of objects
+    id_index = {}
+    for position, obj in enumerate(objects):
+        id_index.setdefault(obj.get('id'), []).append(position)
+        
+    return id_index
+
+def index_objects_by_id(objects: List) -> Dict[str, Dict]:
+    
+    # The first object with an id wins, as with a linear search
+    objects_by_id = {}
+    for obj in objects:
+        objects_by_id.setdefault(obj.get('id'), obj)
+        
+    return objects_by_id
+
+def get_objects_by_id(objects: List, object_ids: List, id_index: Dict[str, List[int]] = None) -> List:
+    
+    if id_index is None:
+        object_ids = set(object_ids)
+        return [obj for obj in objects if obj.get('id') in object_ids]
+    
+    # Keep the order of objects
+    positions = sorted(
+        position for object_id in set(object_ids) for position in id_index.get(object_id, ())
+    )
+    filtered_objects = [objects[position] for position in positions]
     
-    return filtered_clients
\ No newline at end of file
+    return filtered_objects
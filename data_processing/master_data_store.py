@@ -0,0 +1,107 @@
+import logging
+import time
+from typing import Dict, List, Set
+
+from fetching.missy_fetching import (
+    get_distances,
+    get_clients,
+    get_mas,
+    get_prio_assignments,
+    get_schools,
+)
+from fetching.endpoint_cache import endpoint_cache
+from fetching.experience_logging import get_experience_log
+from config import master_data_refresh_interval
+
+logger = logging.getLogger(__name__)
+
+
+class MasterDataStore:
+    """
+    Holds the static master data (distances, clients, MAs, schools, priority
+    assignments and experience log) and reloads it while the polling loop runs.
+
+    Every load builds a complete new snapshot, including the derived school
+    mapping, which replaces the previous one as a whole. The data is reloaded
+    on a schedule and whenever incident records reference clients or MAs that
+    are not part of the current snapshot.
+    """
+
+    def __init__(self, request_info: List[Dict[str, str]], refresh_interval: float = master_data_refresh_interval):
+        self.request_info = request_info
+        self.refresh_interval = refresh_interval
+        self.master_data = None
+        self.loaded_at = None
+        self.client_ids: Set[str] = set()
+        self.ma_ids: Set[str] = set()
+        # Unknown ids that already triggered a reload, so ids that are missing
+        # in Missy as well do not cause a reload on every poll
+        self.checked_unknown_ids: Set[str] = set()
+
+    def load(self) -> Dict:
+        """Load all sources and swap in the new snapshot."""
+        schools = get_schools(self.request_info)
+        master_data = {
+            "distances": get_distances(self.request_info),
+            "clients": get_clients(self.request_info),
+            "mas": get_mas(self.request_info),
+            "prio_assignments": get_prio_assignments(self.request_info),
+            "experience_log": get_experience_log(),
+            "global_schools_mapping": {
+                school.get("id", None): school.get("systemuebergreifendeid", None)
+                for school in schools
+            },
+        }
+
+        self.client_ids = {client.get("id") for client in master_data["clients"]}
+        self.ma_ids = {ma.get("id") for ma in master_data["mas"]}
+        self.master_data = master_data
+        self.loaded_at = time.time()
+        logger.info(
+            f"Master data loaded: {len(self.client_ids)} clients, {len(self.ma_ids)} MAs"
+        )
+
+        return master_data
+
+    def refresh_if_due(self, vertretungen: List[Dict] = None) -> bool:
+        """
+        Reload the master data if the refresh interval passed or the records reference unknown ids.
+
+        Unknown ids force a revalidation of the client and MA endpoints
+        instead of waiting for their cache to expire.
+
+        Returns:
+            True if a new snapshot with changed content was loaded
+        """
+        unknown_ids = self.find_unknown_ids(vertretungen or []) - self.checked_unknown_ids
+        if unknown_ids:
+            logger.info(f"Unknown ids in vertretungen, reloading master data: {unknown_ids}")
+            self.checked_unknown_ids |= unknown_ids
+            for endpoint_key in ("klient", "ma"):
+                endpoint_cache.refresh(self.request_info, endpoint_key)
+        elif time.time() - self.loaded_at < self.refresh_interval:
+            return False
+
+        previous = self.master_data
+        master_data = self.load()
+
+        return any(
+            master_data[key] is not previous[key] and master_data[key] != previous[key]
+            for key in master_data
+        )
+
+    def find_unknown_ids(self, vertretungen: List[Dict]) -> Set[str]:
+        """Ids of clients and MAs referenced by the records that are not part of the snapshot."""
+        unknown_ids = set()
+        for record in vertretungen:
+            for field, known_ids in (
+                ("klientzubegleiten", self.client_ids),
+                ("klientabwesend", self.client_ids),
+                ("mafrei", self.ma_ids),
+                ("mavertretend", self.ma_ids),
+            ):
+                entity_id = (record.get(field) or {}).get("id")
+                if entity_id is not None and entity_id not in known_ids:
+                    unknown_ids.add(entity_id)
+
+        return unknown_ids
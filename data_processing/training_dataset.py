@@ -0,0 +1,194 @@
+import logging
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from data_processing.data_processor import DataProcessor
+from data_processing.features_retrieval.client_features import get_qualifications
+from data_processing.features_retrieval.ma_features import (
+    get_ma_availability,
+    get_ma_qualifications,
+    get_mobility,
+    max_commute_distance,
+)
+from utils.base_availability import base_availability
+
+logger = logging.getLogger(__name__)
+
+training_dataset_path = "data/final_dataset.parquet"
+
+_columns = [
+    "ma_id", "client_id", "date", "timeToSchool", "cl_experience", "school_experience",
+    "short_term_cl_experience", "priority", "ma_availability", "mobility",
+    "geschlecht_relevant", "qualifications_met", "availability_gap",
+]
+
+
+def build_training_dataset(vertretungen: List, data_processor: DataProcessor) -> pd.DataFrame:
+    """
+    Build the (date, MA, client) training rows of all days of the incident history at once.
+
+    Produces the rows of the day-by-day loop over create_day_dataset and
+    create_single_df: on every day, every MA replacing a client in an active
+    incident forms a row with the client of its last active incident. The
+    availability of the MA (client) ends with its first active incident. All
+    incidents are expanded into their days in one step and the features are
+    joined column by column from the master data of the data processor.
+
+    Args:
+        vertretungen: All incident records (vertretungsfall_all)
+        data_processor: Holds the master data and its lookup indexes
+
+    Returns:
+        One row per day and replacing MA, ordered by day
+    """
+    records = [
+        record for record in vertretungen
+        if record.get("mavertretend") and record.get("klientzubegleiten")
+    ]
+    if not records:
+        return pd.DataFrame(columns=_columns)
+
+    starts = np.array([record["startdatum"] for record in records], dtype="datetime64[D]")
+    ends = np.array([record["enddatum"] for record in records], dtype="datetime64[D]")
+
+    # One row per active day of every incident
+    n_days = np.maximum((ends - starts).astype(np.int64) + 1, 0)
+    record_idx = np.repeat(np.arange(len(records)), n_days)
+    day_offsets = np.arange(len(record_idx)) - np.repeat(np.cumsum(n_days) - n_days, n_days)
+    active = pd.DataFrame({
+        "day": starts[record_idx] + day_offsets,
+        "record": record_idx,
+        "ma_id": np.array([record["mavertretend"]["id"] for record in records], dtype=object)[record_idx],
+        "client_id": np.array([record["klientzubegleiten"]["id"] for record in records], dtype=object)[record_idx],
+        "until": ends[record_idx],
+    }).sort_values(["day", "record"], kind="stable")
+
+    pairs = active.groupby(["day", "ma_id"], sort=False).agg(
+        record=("record", "first"),
+        client_id=("client_id", "last"),
+        available_until_mas=("until", "first"),
+    ).reset_index()
+    client_until = active.groupby(["day", "client_id"], sort=False).agg(
+        available_until_client=("until", "first"),
+    ).reset_index()
+    pairs = pairs.merge(client_until, on=["day", "client_id"], how="left")
+
+    # Only MAs and clients of the master data
+    pairs = pairs[
+        pairs["ma_id"].isin(data_processor.ma_index.keys())
+        & pairs["client_id"].isin(data_processor.client_index.keys())
+    ]
+    pairs = pairs.sort_values(["day", "record"], kind="stable").reset_index(drop=True)
+
+    ma_features = _ma_features(data_processor, pairs["ma_id"].unique())
+    client_features = _client_features(data_processor, pairs["client_id"].unique())
+    ma_rows = ma_features.loc[pairs["ma_id"]].reset_index(drop=True)
+    client_rows = client_features.loc[pairs["client_id"]].reset_index(drop=True)
+
+    days = pairs["day"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    experiences = data_processor.experience_store.get_pair_experiences(
+        pairs["ma_id"].tolist(), pairs["client_id"].tolist(), client_rows["school"].tolist(), days
+    )
+
+    qualifications_met = [
+        needed <= qualifications
+        for needed, qualifications in zip(client_rows["neededQualifications"], ma_rows["qualifications"])
+    ]
+
+    return pd.DataFrame({
+        "ma_id": pairs["ma_id"],
+        "client_id": pairs["client_id"],
+        "date": pairs["day"].dt.date,
+        "timeToSchool": _commute_distances(data_processor, pairs["ma_id"], client_rows["school"]),
+        "cl_experience": experiences["client_experience"],
+        "school_experience": experiences["school_experience"],
+        "short_term_cl_experience": experiences["short_term_client_experience"],
+        "priority": client_rows["priority"],
+        "ma_availability": ma_rows["ma_availability"],
+        "mobility": ma_rows["mobility"],
+        "geschlecht_relevant": client_rows["geschlecht_relevant"],
+        "qualifications_met": qualifications_met,
+        "availability_gap": (pairs["available_until_mas"] - pairs["available_until_client"]).dt.days,
+    })
+
+
+def _ma_features(data_processor: DataProcessor, ma_ids: np.ndarray) -> pd.DataFrame:
+    """Date independent features of the MAs, indexed by id."""
+    mas = [data_processor.mas[data_processor.ma_index[ma_id][0]] for ma_id in ma_ids]
+
+    return pd.DataFrame({
+        "qualifications": [set(get_ma_qualifications(ma)) for ma in mas],
+        "ma_availability": [get_ma_availability(ma) == base_availability for ma in mas],
+        "mobility": [get_mobility(ma) for ma in mas],
+    }, index=ma_ids)
+
+
+def _client_features(data_processor: DataProcessor, client_ids: np.ndarray) -> pd.DataFrame:
+    """Date independent features of the clients, indexed by id."""
+    clients = [data_processor.clients[data_processor.client_index[client_id][0]] for client_id in client_ids]
+    priority_ids = [
+        client.get("vertretungab")["id"] if client.get("vertretungab") != None else 100
+        for client in clients
+    ]
+
+    return pd.DataFrame({
+        "neededQualifications": [set(get_qualifications(client)) for client in clients],
+        "geschlecht_relevant": [client.get("begleitergeschlecht") != None for client in clients],
+        "priority": [
+            100 if priority_id == None else data_processor.prio_index.get(priority_id, 100)
+            for priority_id in priority_ids
+        ],
+        "school": [
+            data_processor.global_schools_mapping.get(client.get("schule", {}).get("id", None), None)
+            for client in clients
+        ],
+    }, index=client_ids)
+
+
+def _commute_distances(data_processor: DataProcessor, ma_ids: pd.Series, school_ids: pd.Series) -> np.ndarray:
+    """Distances of the MAs to the schools, NaN if unknown or not reachable."""
+    distance_index = data_processor.distance_index
+    rows = ma_ids.map(distance_index.ma_position).fillna(-1).to_numpy(dtype=np.int64)
+    columns = school_ids.map(distance_index.school_position).fillna(-1).to_numpy(dtype=np.int64)
+
+    distances = np.full(len(rows), np.nan)
+    known = (rows >= 0) & (columns >= 0)
+    distances[known] = distance_index.matrix[rows[known], columns[known]]
+    distances[~(distances < max_commute_distance)] = np.nan
+
+    return distances
+
+
+def save_training_dataset(dataset: pd.DataFrame, path: str = training_dataset_path) -> str:
+    """
+    Write the training dataset as Parquet, or as CSV next to it if no Parquet engine
+    (pyarrow or fastparquet) is installed.
+
+    Returns:
+        The path of the written file
+    """
+    try:
+        dataset.to_parquet(path, index=False)
+    except ImportError:
+        logger.warning("No Parquet engine installed, writing the training dataset as CSV")
+        path = _csv_path(path)
+        dataset.to_csv(path, index=False)
+
+    return path
+
+
+def load_training_dataset(path: str = training_dataset_path) -> pd.DataFrame | None:
+    """Read the training dataset written by save_training_dataset, None if there is none."""
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+    if os.path.exists(_csv_path(path)):
+        return pd.read_csv(_csv_path(path))
+
+    return None
+
+
+def _csv_path(path: str) -> str:
+    return f"{os.path.splitext(path)[0]}.csv"
@@ -1,8 +1,15 @@
+import asyncio
+import logging
 import requests
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 import json
 from base64 import b64encode
 
+from fetching.request_pool import DomainLimiter, get_session, call_with_retries, run_sync
+from config import fetch_timeout, push_max_concurrency
+
+logger = logging.getLogger(__name__)
+
 endpoint = "VMBegleitung"
 
 def update_recommendation(
@@ -31,38 +38,97 @@ def update_recommendation(
     #         if len(erklaerung) > 8000:
     #             raise ValueError(f"erklaerungvorschlag{i} must be 8000 characters or fewer.")
 
-    # Construct the URL
+    return run_sync(update_recommendation_async(request_info, id, recommendations, org))
+
+
+async def update_recommendation_async(
+    request_info: List[Dict[str, str]],
+    id: str,
+    recommendations: List[Tuple[str, str, str]] = [],
+    org: str = None,
+    limiter: DomainLimiter = None,
+) -> Optional[str]:
+    """
+    Updates a AI recommendation record without blocking the event loop.
+
+    Transient errors are retried with exponential backoff. If limiter is
+    given, it bounds the number of concurrent requests per domain.
+
+    Returns:
+        str: Response text of the web service, None if the update failed.
+    """
     for request_data in request_info:
         if org == request_data["url"]:
             url = f"{request_data['url_ai']}{endpoint}"
             print(url)
 
-            # Dynamically build the payload
-            payload = {"id": id}
-
-            for i, (mavertretend, erklaerungkurz, erklaerung) in enumerate(recommendations, start=1):
-                payload[f"mavertretendvorschlag{i}"] = mavertretend
-                payload[f"erklaerungvorschlagkurz{i}"] = erklaerungkurz[:199]
-                payload[f"erklaerungvorschlag{i}"] = erklaerung[:7999]
-
-            
-            token = b64encode(f"{request_data['user']}:{request_data['pw']}".encode('utf-8')).decode("ascii")
-            
+            payload = build_payload(id, recommendations)
             print(payload)
-            
-            headers = {
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'Authorization': f'Basic {token}'
-            }
-            
+
             try:
-                response = requests.put(url, data=payload, headers=headers)
-                print(response.request.method)
-                print(response.request.url)
-                print(response.request.headers)
-                print(response.request.body)
-                response.raise_for_status()
-                return response.text
+                if limiter is None:
+                    return await call_with_retries(put_recommendation, request_data, url, payload)
+                async with limiter.get(request_data["url_ai"]):
+                    return await call_with_retries(put_recommendation, request_data, url, payload)
             except requests.exceptions.RequestException as e:
                 print(f"An error occurred: {e}")
-                return None
\ No newline at end of file
+                return None
+
+
+async def update_recommendations_async(
+    request_info: List[Dict[str, str]],
+    updates: List[Dict],
+) -> List[Optional[str]]:
+    """
+    Push the updates of several incidents concurrently.
+
+    Args:
+        updates: List of {"id": incident id, "recommendations": [...], "org": org url}
+    """
+    limiter = DomainLimiter(push_max_concurrency)
+
+    return await asyncio.gather(
+        *(
+            update_recommendation_async(
+                request_info, update["id"], update["recommendations"], update["org"], limiter
+            )
+            for update in updates
+        )
+    )
+
+
+def update_recommendations(
+    request_info: List[Dict[str, str]],
+    updates: List[Dict],
+) -> List[Optional[str]]:
+    """Synchronous wrapper of update_recommendations_async."""
+    return run_sync(update_recommendations_async(request_info, updates))
+
+
+def build_payload(id: str, recommendations: List[Tuple[str, str, str]]) -> Dict[str, str]:
+    """Dynamically build the form payload of a VMBegleitung update."""
+    payload = {"id": id}
+
+    for i, (mavertretend, erklaerungkurz, erklaerung) in enumerate(recommendations, start=1):
+        payload[f"mavertretendvorschlag{i}"] = mavertretend
+        payload[f"erklaerungvorschlagkurz{i}"] = erklaerungkurz[:199]
+        payload[f"erklaerungvorschlag{i}"] = erklaerung[:7999]
+
+    return payload
+
+
+def put_recommendation(request_data: Dict[str, str], url: str, payload: Dict[str, str]) -> str:
+    """PUT the payload over the pooled session of the domain, raising on HTTP errors."""
+    token = b64encode(f"{request_data['user']}:{request_data['pw']}".encode('utf-8')).decode("ascii")
+
+    headers = {
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'Authorization': f'Basic {token}'
+    }
+
+    response = get_session(request_data["url_ai"]).put(
+        url, data=payload, headers=headers, timeout=fetch_timeout
+    )
+    logger.debug(f"{response.request.method} {response.request.url}: {response.status_code}")
+    response.raise_for_status()
+    return response.text
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from base64 import b64encode
+from typing import Any, Dict, List, Optional, Tuple
+
+from endpoints import endpoints_missy
+from fetching.request_pool import get_session, call_with_retries, run_sync
+from utils.read_file import read_file
+from config import endpoint_cache_ttls, endpoint_cache_default_ttl, fetch_timeout
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_object_conditional(
+    request_info: Dict[str, str], endpoint_key: str, validator: Dict = None
+) -> Tuple[Optional[List[Any]], Dict]:
+    """
+    Revalidate an endpoint of one domain with a conditional GET.
+
+    The request carries the ETag and Last-Modified of the previous response.
+    Servers that ignore them are detected by comparing the hash of the body.
+
+    Args:
+        request_info: Credentials and url of the domain
+        endpoint_key: Key of the endpoint in endpoints_missy
+        validator: ETag, Last-Modified and content hash of the previous response
+
+    Returns:
+        The new elements (None if unchanged) and the validator of the response
+    """
+    validator = validator or {}
+    url = f"{request_info['url']}{endpoints_missy[endpoint_key]}"
+    print(f"Revalidating {url}")
+
+    token = b64encode(f"{request_info['user']}:{request_info['pw']}".encode('utf-8')).decode("ascii")
+    headers = {
+        'Content-Type': 'application/json',
+        'Authorization': f'Basic {token}'
+    }
+    if validator.get("etag"):
+        headers["If-None-Match"] = validator["etag"]
+    if validator.get("last_modified"):
+        headers["If-Modified-Since"] = validator["last_modified"]
+
+    response = get_session(request_info['url']).get(url, headers=headers, timeout=fetch_timeout)
+    if response.status_code == 304:
+        return None, validator
+    response.raise_for_status()
+
+    new_validator = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": hashlib.sha1(response.content).hexdigest(),
+    }
+    if new_validator["content_hash"] == validator.get("content_hash"):
+        return None, new_validator
+
+    # Always only one element in the response
+    return list(response.json().values())[0], new_validator
+
+
+class EndpointCache:
+    """
+    Snapshots of the static Missy endpoints with a time to live per endpoint.
+
+    A snapshot is served from memory (or data/<endpoint_key>.json after a
+    restart) as long as it is fresh. Once it expired, it is still served,
+    while a background thread revalidates every domain with a conditional
+    GET and swaps in the new snapshot if the content changed. Only the very
+    first load of an endpoint without any cached file blocks.
+    """
+
+    def __init__(self):
+        self.snapshots: Dict[str, Dict] = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def get(self, request_info: List[Dict[str, str]], endpoint_key: str) -> List[Any]:
+        """Return the combined elements of all domains of the current snapshot."""
+        snapshot = self.snapshots.get(endpoint_key)
+        if snapshot is None:
+            snapshot = self._load_snapshot(request_info, endpoint_key)
+
+        if time.time() - snapshot["fetched_at"] > self._ttl(endpoint_key):
+            self.refresh_in_background(request_info, endpoint_key)
+
+        return snapshot["combined"]
+
+    def get_version(self, endpoint_key: str) -> int:
+        """Counter that increases whenever the content of an endpoint changed."""
+        snapshot = self.snapshots.get(endpoint_key)
+        return snapshot["version"] if snapshot is not None else 0
+
+    def refresh_in_background(self, request_info: List[Dict[str, str]], endpoint_key: str) -> None:
+        """Start revalidating an endpoint, unless a refresh of it is already running."""
+        with self.lock:
+            if endpoint_key in self.refreshing:
+                return
+            self.refreshing.add(endpoint_key)
+
+        threading.Thread(
+            target=self._refresh, args=(request_info, endpoint_key), daemon=True
+        ).start()
+
+    def refresh(self, request_info: List[Dict[str, str]], endpoint_key: str) -> bool:
+        """
+        Revalidate all domains of an endpoint and swap in the new snapshot.
+
+        Returns:
+            True if the content of any domain changed
+        """
+        snapshot = self.snapshots.get(endpoint_key) or self._empty_snapshot(request_info)
+        validators = snapshot["validators"]
+
+        async def revalidate():
+            return await asyncio.gather(
+                *(
+                    call_with_retries(fetch_object_conditional, info, endpoint_key, validator)
+                    for info, validator in zip(request_info, validators)
+                )
+            )
+
+        results = run_sync(revalidate())
+        changed = any(elements is not None for elements, _ in results)
+        responses = [
+            elements if elements is not None else previous
+            for (elements, _), previous in zip(results, snapshot["responses"])
+        ]
+        new_snapshot = self._build_snapshot(
+            responses,
+            [validator for _, validator in results],
+            time.time(),
+            snapshot["version"] + int(changed),
+        )
+        # Swapping the reference is atomic, readers keep their previous snapshot
+        self.snapshots[endpoint_key] = new_snapshot
+        self._store_snapshot(endpoint_key, new_snapshot, write_data=changed)
+        logger.info(f"Revalidated {endpoint_key}: {'changed' if changed else 'unchanged'}")
+
+        return changed
+
+    def _refresh(self, request_info: List[Dict[str, str]], endpoint_key: str) -> None:
+        try:
+            self.refresh(request_info, endpoint_key)
+        except Exception as e:
+            logger.error(f"Error while refreshing {endpoint_key}: {e}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(endpoint_key)
+
+    def _load_snapshot(self, request_info: List[Dict[str, str]], endpoint_key: str) -> Dict:
+        """Load the snapshot of data/<endpoint_key>.json or fetch it if there is none."""
+        responses = read_file(endpoint_key)
+        if responses is None or len(responses) != len(request_info):
+            self.snapshots[endpoint_key] = self._empty_snapshot(request_info)
+            self.refresh(request_info, endpoint_key)
+            return self.snapshots[endpoint_key]
+
+        meta = read_file(f"{endpoint_key}_meta") or {}
+        validators = meta.get("validators")
+        if validators is None or len(validators) != len(request_info):
+            validators = [{} for _ in request_info]
+        fetched_at = meta.get("fetched_at", os.path.getmtime(f"data/{endpoint_key}.json"))
+
+        snapshot = self._build_snapshot(responses, validators, fetched_at, 1)
+        self.snapshots[endpoint_key] = snapshot
+
+        return snapshot
+
+    def _store_snapshot(self, endpoint_key: str, snapshot: Dict, write_data: bool) -> None:
+        if write_data:
+            with open(f"data/{endpoint_key}.json", "w") as outfile:
+                outfile.write(json.dumps(snapshot["responses"], indent=4))
+        with open(f"data/{endpoint_key}_meta.json", "w") as outfile:
+            outfile.write(
+                json.dumps(
+                    {"fetched_at": snapshot["fetched_at"], "validators": snapshot["validators"]},
+                    indent=4,
+                )
+            )
+
+    def _build_snapshot(self, responses: List, validators: List, fetched_at: float, version: int) -> Dict:
+        combined = []
+        for resp in responses:
+            combined.extend(resp)
+
+        return {
+            "responses": responses,
+            "combined": combined,
+            "validators": validators,
+            "fetched_at": fetched_at,
+            "version": version,
+        }
+
+    def _empty_snapshot(self, request_info: List[Dict[str, str]]) -> Dict:
+        return self._build_snapshot([[] for _ in request_info], [{} for _ in request_info], 0, 0)
+
+    def _ttl(self, endpoint_key: str) -> float:
+        return endpoint_cache_ttls.get(endpoint_key, endpoint_cache_default_ttl)
+
+
+endpoint_cache = EndpointCache()
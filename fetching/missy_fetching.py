@@ -1,4 +1,4 @@
-import requests
+import asyncio
 import json
 from datetime import datetime
 from endpoints import endpoints_missy
@@ -6,9 +6,12 @@ from utils.read_file import read_file
 from base64 import b64encode
 from utils.daterange import daterange
 from typing import List, Dict, Any, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
 
+from fetching.request_pool import get_session, call_with_retries, run_sync
+from fetching.endpoint_cache import endpoint_cache
+from config import fetch_max_workers, fetch_timeout
+
 def get_vertretungen(request_info: List[Dict[str, str]], date: str, use_cache = False) -> List[Any]:
     
     endpoint_key = 'vertretungsfall'
@@ -21,7 +24,10 @@ def get_clients(request_info: List[Dict[str, str]], use_cache = True) -> List[An
     
     endpoint_key = 'klient'
     
-    clients = fetch_many(request_info, use_cache=use_cache, endpoint_key=endpoint_key)
+    if use_cache:
+        clients = endpoint_cache.get(request_info, endpoint_key)
+    else:
+        clients = fetch_many(request_info, use_cache=False, endpoint_key=endpoint_key)
     
     return clients
 
@@ -29,7 +35,10 @@ def get_mas(request_info: List[Dict[str, str]], use_cache = True) -> List[Any]:
     
     endpoint_key = 'ma'
     
-    mas = fetch_many(request_info, use_cache=use_cache, endpoint_key=endpoint_key)
+    if use_cache:
+        mas = endpoint_cache.get(request_info, endpoint_key)
+    else:
+        mas = fetch_many(request_info, use_cache=False, endpoint_key=endpoint_key)
     
     return mas
 
@@ -45,7 +54,10 @@ def get_distances(request_info: List[Dict[str, str]], use_cache = True) -> List[
     
     endpoint_key = 'dist_ma_sch'
     
-    distances = fetch_many(request_info, use_cache=use_cache, endpoint_key=endpoint_key)
+    if use_cache:
+        distances = endpoint_cache.get(request_info, endpoint_key)
+    else:
+        distances = fetch_many(request_info, use_cache=False, endpoint_key=endpoint_key)
     
     return distances
 
@@ -53,27 +65,50 @@ def get_schools(request_info: List[Dict[str, str]], use_cache = True) -> List[An
     
     endpoint_key = 'school'
     
-    schools = fetch_many(request_info, use_cache=use_cache, endpoint_key=endpoint_key)
+    if use_cache:
+        schools = endpoint_cache.get(request_info, endpoint_key)
+    else:
+        schools = fetch_many(request_info, use_cache=False, endpoint_key=endpoint_key)
     
     return schools
 
-def parallel_fetch_object(request_info: Dict[str, str], endpoint_key: str, parallel: bool = False, max_workers: int = 5, date: str = None, add_global_info: bool = False) -> List[Any]:
-    responses = []
+def parallel_fetch_object(request_info: List[Dict[str, str]], endpoint_key: str, parallel: bool = True, max_workers: int = fetch_max_workers, date: str = None, add_global_info: bool = False) -> List[Any]:
+    """
+    Fetch an endpoint from all domains, concurrently (with retries) if parallel is set.
+
+    The responses keep the order of request_info in both cases.
+    """
     if parallel and len(request_info) > 1:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_info = {executor.submit(fetch_object, info, endpoint_key, date): info for info in request_info}
-            for future in as_completed(future_to_info):
-                responses.append(future.result())
+        responses = run_sync(
+            parallel_fetch_object_async(request_info, endpoint_key, max_workers, date, add_global_info)
+        )
     else:
-        for info in request_info:
-            full_response = fetch_object(info, endpoint_key, date)
-            if add_global_info:
-                for elem in full_response:
-                    elem["org"] = info["url"]
-            responses.append(full_response)
-            
+        responses = [
+            fetch_domain_object(info, endpoint_key, date, add_global_info)
+            for info in request_info
+        ]
+
     return responses
 
+async def parallel_fetch_object_async(request_info: List[Dict[str, str]], endpoint_key: str, max_workers: int = fetch_max_workers, date: str = None, add_global_info: bool = False) -> List[Any]:
+    """Fetch an endpoint from all domains on the event loop, at most max_workers at a time."""
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def fetch(info):
+        async with semaphore:
+            return await call_with_retries(fetch_domain_object, info, endpoint_key, date, add_global_info)
+
+    return await asyncio.gather(*(fetch(info) for info in request_info))
+
+def fetch_domain_object(request_info: Dict[str, str], endpoint_key: str, date: str = None, add_global_info: bool = False) -> List[Any]:
+    """Fetch an endpoint from one domain, tagging every element with its org if add_global_info is set."""
+    full_response = fetch_object(request_info, endpoint_key, date)
+    if add_global_info:
+        for elem in full_response:
+            elem["org"] = request_info["url"]
+
+    return full_response
+
 def fetch_object(request_info: Dict[str, str], endpoint_key: str, date: str = None) -> List[Any]:
     
     user = request_info['user']
@@ -94,7 +129,7 @@ def fetch_object(request_info: Dict[str, str], endpoint_key: str, date: str = No
         'Content-Type': 'application/json',
         'Authorization': f'Basic {token}'
     }
-    response = requests.get(url, headers=headers)
+    response = get_session(base_url).get(url, headers=headers, timeout=fetch_timeout)
     response.raise_for_status()
     response_object = response.json()
     print(f"Response Object: {response_object}")
@@ -103,8 +138,8 @@ def fetch_object(request_info: Dict[str, str], endpoint_key: str, date: str = No
 
 def fetch_many(
     request_info: List[Dict[str, str]],
-    parallel: bool = False,
-    max_workers: int = 5,
+    parallel: bool = True,
+    max_workers: int = fetch_max_workers,
     use_cache: bool = True,
     endpoint_key: str = None,
     date: str = None,
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import fetch_max_workers, request_retries, request_backoff
+
+logger = logging.getLogger(__name__)
+
+# One keep-alive session per domain, shared by all requests to it
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(base_url: str) -> requests.Session:
+    """Return the pooled keep-alive session of a domain, creating it on first use."""
+    with _sessions_lock:
+        if base_url not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=fetch_max_workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[base_url] = session
+        return _sessions[base_url]
+
+
+class DomainLimiter:
+    """Bounds the number of concurrent requests per domain within one event loop."""
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def get(self, domain: str) -> asyncio.Semaphore:
+        if domain not in self.semaphores:
+            self.semaphores[domain] = asyncio.Semaphore(self.max_concurrency)
+        return self.semaphores[domain]
+
+
+def is_retryable(error: requests.exceptions.RequestException) -> bool:
+    """Connection problems, timeouts, rate limits and server errors are worth a retry."""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(
+        error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+    )
+
+
+async def call_with_retries(
+    func: Callable,
+    *args,
+    retries: int = request_retries,
+    backoff: float = request_backoff,
+    **kwargs,
+) -> Any:
+    """
+    Run a blocking request function in a worker thread, retrying with exponential backoff.
+
+    Args:
+        func: Function performing the request, raising a RequestException on failure
+        retries: Number of retries after the first attempt
+        backoff: Delay before the first retry in seconds, doubled for every further retry
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = backoff * 2**attempt
+            logger.warning(f"Request failed ({e}), retrying in {delay:.1f} s")
+            await asyncio.sleep(delay)
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """Run a coroutine from synchronous code, also if an event loop is already running (e.g. notebooks)."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
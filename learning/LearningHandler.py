@@ -1,4 +1,5 @@
 from typing import Tuple, List, Dict
+import numpy as np
 import pandas as pd
 from utils.add_comment import add_employee_customer_comment
 from learning.model import AbnormalityModel
@@ -22,6 +23,29 @@ class LearningHandler:
         shap_values = self.abnormality_model.get_explanation(datapoint[0])
         return shap_values[0]
 
+    def predict_score_and_explain(self, datapoints: List[List]) -> Tuple[List[Tuple[int, float]], np.ndarray]:
+        """
+        Predict, score and explain several datapoints (as returned by prepare_data) at once.
+
+        Args:
+            datapoints: One prepare_data result per recommended pair
+
+        Returns:
+            The (prediction, score) of every datapoint and their SHAP values, one row each
+        """
+        X = np.array(
+            [[np.nan if value is None else value for value in datapoint[0]] for datapoint in datapoints],
+            dtype=float,
+        )
+        preds = self.abnormality_model.predict(X)
+        samples = self.abnormality_model.score_samples(X)
+        shap_values = self.abnormality_model.get_explanation(X)
+
+        learner_infos = [
+            (pred, float("{:.2f}".format(sample))) for pred, sample in zip(preds, samples)
+        ]
+        return learner_infos, shap_values
+
     def prepare_data(self, assignment: Dict, employees: pd.DataFrame, clients: pd.DataFrame) -> List[List] | None:
         
         # Find the corresponding rows
@@ -0,0 +1,178 @@
+"""Array-based inference for a trained Isolation Forest."""
+
+import numba
+import numpy as np
+
+flat_model_path = "models/isolation_forest_flat.npz"
+
+
+class FlatIsolationForest:
+    """
+    Isolation Forest flattened into contiguous arrays.
+
+    The nodes of all trees are concatenated, children point to global node
+    positions and every node carries the depth a sample ending there
+    contributes (decision path length plus average path length of the
+    samples in the leaf). A batch of samples descends the trees in a loop
+    compiled with numba, and the scores are identical to
+    IsolationForest.score_samples.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children_left: np.ndarray,
+        children_right: np.ndarray,
+        missing_go_to_left: np.ndarray,
+        leaf_depth: np.ndarray,
+        tree_roots: np.ndarray,
+        n_features: int,
+        denominator: float,
+        offset: float,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.missing_go_to_left = missing_go_to_left
+        self.leaf_depth = leaf_depth
+        self.tree_roots = tree_roots
+        self.n_features = n_features
+        self.denominator = denominator
+        self.offset = offset
+
+    @classmethod
+    def from_isolation_forest(cls, model) -> "FlatIsolationForest":
+        """Flatten a fitted scikit-learn IsolationForest."""
+        from sklearn.ensemble._iforest import _average_path_length
+
+        subsample_features = model._max_features != model.n_features_in_
+        features, thresholds, lefts, rights, missing_left, leaf_depths, roots = [], [], [], [], [], [], []
+        offset = 0
+        for tree_idx, (estimator, estimator_features) in enumerate(
+            zip(model.estimators_, model.estimators_features_)
+        ):
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+
+            tree_feature = tree.feature.astype(np.int64)
+            if subsample_features:
+                tree_feature = np.asarray(estimator_features)[tree_feature]
+            features.append(np.where(is_leaf, -1, tree_feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+            rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+            missing_left.append(tree.missing_go_to_left.astype(bool))
+            leaf_depths.append(
+                model._decision_path_lengths[tree_idx]
+                + model._average_path_length_per_tree[tree_idx]
+                - 1.0
+            )
+            roots.append(offset)
+            offset += tree.node_count
+
+        return cls(
+            np.concatenate(features).astype(np.int32),
+            np.concatenate(thresholds),
+            np.concatenate(lefts).astype(np.int32),
+            np.concatenate(rights).astype(np.int32),
+            np.concatenate(missing_left),
+            np.concatenate(leaf_depths),
+            np.array(roots, dtype=np.int32),
+            model.n_features_in_,
+            float(len(model.estimators_) * _average_path_length([model._max_samples])[0]),
+            float(model.offset_),
+        )
+
+    @classmethod
+    def load(cls, path: str = flat_model_path) -> "FlatIsolationForest":
+        with np.load(path) as data:
+            return cls(
+                data["feature"],
+                data["threshold"],
+                data["children_left"],
+                data["children_right"],
+                data["missing_go_to_left"],
+                data["leaf_depth"],
+                data["tree_roots"],
+                int(data["n_features"]),
+                float(data["denominator"]),
+                float(data["offset"]),
+            )
+
+    def save(self, path: str = flat_model_path) -> None:
+        np.savez(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            children_left=self.children_left,
+            children_right=self.children_right,
+            missing_go_to_left=self.missing_go_to_left,
+            leaf_depth=self.leaf_depth,
+            tree_roots=self.tree_roots,
+            n_features=self.n_features,
+            denominator=self.denominator,
+            offset=self.offset,
+        )
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """
+        Anomaly scores of samples, the lower, the more abnormal.
+
+        Args:
+            X: Input features, one row per sample
+
+        Returns:
+            Array of anomaly scores
+        """
+        # The trees split on float32 features, like scikit-learn
+        X = np.asarray(np.asarray(X, dtype=float), dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(
+                f"X has shape {X.shape}, but the forest expects {self.n_features} features"
+            )
+
+        depths = _sum_leaf_depths(
+            X,
+            self.feature,
+            self.threshold,
+            self.children_left,
+            self.children_right,
+            self.missing_go_to_left,
+            self.leaf_depth,
+            self.tree_roots,
+        )
+
+        scores = 2 ** (
+            -np.divide(depths, self.denominator, out=np.ones_like(depths), where=self.denominator != 0)
+        )
+        return -scores
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Anomaly scores shifted by the offset of the forest, negative for outliers."""
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predictions (-1 for outliers, 1 for inliers)."""
+        is_inlier = np.ones(len(np.asarray(X)), dtype=int)
+        is_inlier[self.decision_function(X) < 0] = -1
+        return is_inlier
+
+
+@numba.njit(cache=True, nogil=True)
+def _sum_leaf_depths(X, feature, threshold, children_left, children_right, missing_go_to_left, leaf_depth, tree_roots):
+    """Sum of the leaf depths of every sample over all trees, added tree by tree like scikit-learn."""
+    depths = np.zeros(X.shape[0])
+    for root in tree_roots:
+        for i in range(X.shape[0]):
+            node = root
+            while feature[node] >= 0:
+                value = X[i, feature[node]]
+                if np.isnan(value):
+                    go_left = missing_go_to_left[node]
+                else:
+                    go_left = value <= threshold[node]
+                node = children_left[node] if go_left else children_right[node]
+            depths[i] += leaf_depth[node]
+    return depths
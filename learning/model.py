@@ -4,15 +4,13 @@ import numpy as np
 from typing import Dict, Any, Optional
 from pickle import dump, load
 import os
-from sklearn.ensemble import IsolationForest
-from sklearn.metrics import roc_auc_score, average_precision_score
-import seaborn as sns
-import matplotlib.pyplot as plt
 import pandas as pd
 from datetime import datetime
-import shap
+from learning.flat_forest import FlatIsolationForest, flat_model_path
 model_path = "models/isolation_forst.pkl"
-explainer_path = "models/explainer.pkl"
+explainer_background_path = "models/explainer_background.npy"
+# Number of training rows the explainer integrates over
+explainer_background_size = 100
 
 
 class AbnormalityModel:
@@ -39,17 +37,61 @@ class AbnormalityModel:
         }
         if model_params:
             default_params.update(model_params)
+        self.model_params = default_params
+        self.use_cache = use_cache
 
-        if use_cache and os.path.exists(model_path):
-            with open(model_path, "rb") as f:
-                self.model = load(f)
+        # scikit-learn model, only loaded once needed (training, explanation or without flat model)
+        self._model = None
+        # Array-based copy of the forest for inference, if exported after the last training
+        if (
+            use_cache
+            and os.path.exists(flat_model_path)
+            and os.path.exists(model_path)
+            and os.path.getmtime(flat_model_path) >= os.path.getmtime(model_path)
+        ):
+            self.flat_model = FlatIsolationForest.load(flat_model_path)
         else:
-            self.model = IsolationForest(**default_params)
-        if use_cache and os.path.exists(explainer_path):
-            with open(explainer_path, "rb") as f:
-                self.explainer = load(f)
+            self.flat_model = None
+        if use_cache and os.path.exists(explainer_background_path):
+            self.background = np.load(explainer_background_path)
         else:
-            self.explainer = None
+            self.background = None
+        # Built on the first explanation from the model and the background
+        self._explainer = None
+
+    @property
+    def model(self):
+        """The scikit-learn IsolationForest, unpickled or created on first access."""
+        if self._model is None:
+            if self.use_cache and os.path.exists(model_path):
+                with open(model_path, "rb") as f:
+                    self._model = load(f)
+            else:
+                from sklearn.ensemble import IsolationForest
+
+                self._model = IsolationForest(**self.model_params)
+        return self._model
+
+    @property
+    def explainer(self):
+        """
+        Tree SHAP explainer of the isolation forest.
+
+        Attributes the expected path length (higher is more normal) by
+        following the tree paths against a small background sample of the
+        training data. Without a background, the sample counts stored in the
+        tree nodes are used instead.
+        """
+        if self._explainer is None:
+            import shap
+
+            if self.background is not None:
+                self._explainer = shap.TreeExplainer(
+                    self.model, data=self.background, feature_perturbation="interventional"
+                )
+            else:
+                self._explainer = shap.TreeExplainer(self.model)
+        return self._explainer
 
     def train(self, X: np.ndarray) -> None:
         """
@@ -58,13 +100,27 @@ class AbnormalityModel:
         Args:
             X: Input features (no labels needed for unsupervised learning)
         """
+        import shap
+
         self.model.fit(X)
-        self.explainer = shap.KernelExplainer(self.model.predict, X)
+        self.background = np.asarray(
+            shap.sample(X, explainer_background_size, random_state=42), dtype=float
+        )
+        self._explainer = None
+        self.flat_model = None
         with open(model_path, "wb") as f:
             dump(self.model, f, protocol=5)
-        with open(explainer_path, "wb") as f:
-            dump(self.explainer, f, protocol=5)
-        
+        np.save(explainer_background_path, self.background)
+
+    def export_flat_model(self, path: str = flat_model_path) -> None:
+        """
+        Export the trained forest as flat arrays for fast inference.
+
+        Args:
+            path: Path of the .npz file
+        """
+        self.flat_model = FlatIsolationForest.from_isolation_forest(self.model)
+        self.flat_model.save(path)
 
     def predict(self, X: np.ndarray) -> np.ndarray:
         """
@@ -76,6 +132,8 @@ class AbnormalityModel:
         Returns:
             Array of predictions (-1 for outliers, 1 for inliers)
         """
+        if self.flat_model is not None:
+            return self.flat_model.predict(X)
         return self.model.predict(X)
 
     def score_samples(self, X: np.ndarray) -> np.ndarray:
@@ -89,6 +147,8 @@ class AbnormalityModel:
         Returns:
             Array of anomaly scores
         """
+        if self.flat_model is not None:
+            return self.flat_model.score_samples(X)
         return self.model.score_samples(X)
 
     def evaluate(
@@ -106,6 +166,8 @@ class AbnormalityModel:
         Returns:
             Dictionary of evaluation metrics
         """
+        from sklearn.metrics import roc_auc_score, average_precision_score
+
         scores = self.score_samples(X)
 
         metrics = {
@@ -138,6 +200,8 @@ class AbnormalityModel:
         Returns:
             Array of decision function values
         """
+        if self.flat_model is not None:
+            return self.flat_model.decision_function(X)
         return self.model.decision_function(X)
 
     def visualize(self, X: np.ndarray) -> None:
@@ -148,6 +212,8 @@ class AbnormalityModel:
             X: Input features
             y_true: Optional true labels (1 for normal, -1 for anomaly)
         """
+        import seaborn as sns
+        import matplotlib.pyplot as plt
 
         df = pd.DataFrame(
             X,
@@ -193,12 +259,20 @@ class AbnormalityModel:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         g.savefig(f"models/isolation_forest_visualization_{timestamp}.png")
 
-    def get_explanation(self, X: np.ndarray) -> str:
+    def get_explanation(self, X: np.ndarray) -> np.ndarray:
+        """
+        Get the SHAP values of samples, one row per sample.
+
+        Args:
+            X: Input features of one sample (list) or several samples (2D)
+
+        Returns:
+            Array of SHAP values, positive values push towards normal
+        """
         print(f"X: {X}")
         # Convert input to numpy array if it's a list
         if isinstance(X, list):
-            X = np.array(X).reshape(1, -1)  # Reshape to 2D array with one row
-        # Use SHAP's KernelExplainer for IsolationForest
+            X = np.array(X, dtype=float).reshape(1, -1)  # Reshape to 2D array with one row
         shap_values = self.explainer.shap_values(X)
-        
+
         return shap_values
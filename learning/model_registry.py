@@ -0,0 +1,46 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from learning.flat_forest import flat_model_path
+from learning.model import AbnormalityModel, model_path, explainer_background_path
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Process-wide AbnormalityModel that is only reloaded when its files change.
+
+    The model is loaded on the first request and kept together with the
+    modification times of the model files. Later requests return the same
+    instance (including its already built explainer) as long as none of the
+    files was replaced, e.g. by a new training run.
+    """
+
+    def __init__(self, paths=(model_path, flat_model_path, explainer_background_path)):
+        self.paths = paths
+        self.model: Optional[AbnormalityModel] = None
+        self.file_versions: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def get(self) -> AbnormalityModel:
+        """Return the current model, reloading it if any model file changed since it was loaded."""
+        file_versions = self._file_versions()
+        with self.lock:
+            if self.model is None or file_versions != self.file_versions:
+                if self.model is not None:
+                    logger.info("Model files changed, reloading abnormality model")
+                self.model = AbnormalityModel()
+                self.file_versions = file_versions
+            return self.model
+
+    def _file_versions(self) -> Dict[str, float]:
+        return {
+            path: os.path.getmtime(path) if os.path.exists(path) else None
+            for path in self.paths
+        }
+
+
+model_registry = ModelRegistry()
@@ -4,29 +4,20 @@ import logging
 from datetime import datetime, timedelta
 import time
 import json
-from fetching.missy_fetching import (
-    get_distances,
-    get_clients,
-    get_mas,
-    get_prio_assignments,
-    get_schools,
-)
-from fetching.experience_logging import get_experience_log
 from utils.add_comment import add_abnormality_comment
 from utils.append_to_json_file import append_to_json_file
 from config import relevant_date_test
 
 from data_processing.data_processor import DataProcessor
+from data_processing.master_data_store import MasterDataStore
 from fetching.missy_fetching import get_vertretungen
-from data_processing.features_retrieval.retrieve_ids import (
-    get_open_client_ids,
-    get_free_ma_ids,
-)
-from optimize.optimize import Optimizer
-from learning.model import AbnormalityModel
+from optimize.OptimizationSession import OptimizationSession
+from learning.model_registry import model_registry
 from learning.LearningHandler import LearningHandler
 from utils.assignment_alternatives import collect_alternatives
-from utils.send_update import send_update
+from utils.change_detection import ChangeDetector, has_changes
+from utils.send_update import send_updates
+from utils.push_cache import PushCache
 
 from config import (
     training_features_de,
@@ -61,33 +52,19 @@ request_info = [
     for spec in request_specs
 ]
 
-# Retrieve mostly static data
-distances = get_distances(request_info)
-clients = get_clients(request_info)
-mas = get_mas(request_info)
-schools = get_schools(request_info)
-prio_assignments = get_prio_assignments(request_info)
-experience_log = get_experience_log()
-
-global_schools_mapping = {
-    school.get("id", None): school.get("systemuebergreifendeid", None)
-    for school in schools
-}
+# Mostly static data, reloaded by the store while the loop is running
+master_data_store = MasterDataStore(request_info)
+master_data_store.load()
 
 sleep_start = 21
 sleep_end = 5
 
 def main():
 
-    data_processor = DataProcessor(
-        mas,
-        clients,
-        prio_assignments,
-        distances,
-        experience_log,
-        global_schools_mapping,
-    )
-    old_vertretungen = None
+    data_processor = DataProcessor(**master_data_store.master_data)
+    optimization_session = OptimizationSession()
+    change_detector = ChangeDetector()
+    push_cache = PushCache()
 
     while True:
         now = datetime.now()
@@ -122,128 +99,83 @@ def main():
             time.sleep(10)
             continue
 
-        relevant_date = datetime.strptime(relevant_date, "%Y-%m-%d")
+        # Swap in new master data on schedule or if the records reference unknown clients or MAs
+        master_data_changed = False
+        try:
+            if master_data_store.refresh_if_due(vertretungen):
+                data_processor.set_master_data(**master_data_store.master_data)
+                master_data_changed = True
+        except Exception as e:
+            logger.error(f"Error while reloading master data: {e}")
 
-        if vertretungen != old_vertretungen:
-            old_vertretungen = vertretungen
-        else:
+        # Only re-optimize if relevant fields of the incident records or the master data changed
+        delta = change_detector.update(vertretungen, relevant_date)
+        if not has_changes(delta) and not master_data_changed:
             logger.info("No new updates")
             time.sleep(10)
             continue
 
-        mabw_records = data_processor.get_mabw_records(vertretungen)
-        open_client_records = mabw_records["open_clients"]
-        rescheduled_ma_records = mabw_records["rescheduled_mas"]
-
-        ma_assignments = data_processor.get_ma_assignments(rescheduled_ma_records)
-        assigned_mas = list(ma_assignments.keys())
-        print("assigned_mas: ", assigned_mas)
-        kabw_records = data_processor.get_kabw_records(vertretungen, assigned_mas)
-
-        print("kabw_records: ", kabw_records)
-
-        client_record_assignments = data_processor.get_client_record_assignments(
-            open_client_records
-        )
-
-        print("client_record_assignments: ", client_record_assignments)
-
-        absent_client_records = kabw_records["absent_clients"]
-        free_ma_records = kabw_records["free_mas"]
-
-        print("Records extrahiert")
-
-        open_client_ids = get_open_client_ids(open_client_records)
-        free_ma_ids = get_free_ma_ids(free_ma_records, absent_client_records, mas)
-        free_ma_ids_only = list(map(lambda x: x["id"], free_ma_ids))
-        open_client_ids_only = list(map(lambda x: x["id"], open_client_ids))
-
-        print("ids gesammelt")
+        relevant_date = datetime.strptime(relevant_date, "%Y-%m-%d")
 
-        clients_df, mas_df = data_processor.create_day_dataset(
-            open_client_ids_only, free_ma_ids_only, relevant_date
+        clients_df, mas_df, client_record_assignments = (
+            data_processor.create_optimization_dataset(vertretungen, relevant_date)
         )
 
-        # iterate over the mas_df and add a column "available_until" based on the free_ma_ids in the form {"id": "123", "until": "2025-01-01"}
-        # First, generate the column with the correct values and then add it to the dataframe
-        mas_df["available_until"] = mas_df["id"].map(
-            lambda x: next(
-                (item["until"] for item in free_ma_ids if item["id"] == x), None
-            )
-        )
-        clients_df["available_until"] = clients_df["id"].map(
-            lambda x: next(
-                (item["until"] for item in open_client_ids if item["id"] == x), None
-            )
-        )
+        # Loaded once and only reloaded when the model files change
+        abnormality_model = model_registry.get()
 
-        clients_df["ma_blacklist"] = clients_df["id"].map(
-            lambda x: next(
-                (item["ma_blacklist"] for item in open_client_ids if item["id"] == x),
-                None,
-            )
+        optimization_session.get_optimizer(
+            mas_df, clients_df, abnormality_model, day=relevant_date
         )
 
-        print("ma- und klientendatenframes erstellt")
-
-        abnormality_model = AbnormalityModel()
-
-        optimizer = Optimizer(mas_df, clients_df, abnormality_model)
-        optimizer.create_model()
-
         learner = LearningHandler(abnormality_model)
 
-        objective_value = None
-        assigned_pairs_list = []
-        recommendation_ids = []
-        for _ in range(3):
-            try:
-                objective_value = optimizer.solve_model(objective_value)
-            except Exception as e:
-                logger.error(f"Error while solving model: {e}")
-                continue
-            if objective_value is None:
-                break
-            objective_value = int(
-                objective_value * 1.10
-            )  # increase objective value by 10%
-            assigned_pairs, recommendation_id = optimizer.process_results()
-            assigned_pairs_list.append(assigned_pairs)
-            recommendation_ids.append(recommendation_id)
-
-        transposed_pair_list = collect_alternatives(assigned_pairs_list)
-        recommendations = []
+        # Best three distinct MA candidates per open client
+        try:
+            alternatives = optimization_session.solve_alternatives(3)
+        except Exception as e:
+            logger.error(f"Error while solving model: {e}")
+            alternatives = None
+        assigned_pairs_list = alternatives["assigned_pairs_list"] if alternatives else []
+        recommendation_ids = alternatives["recommendation_ids"] if alternatives else []
+
+        transposed_pair_list = collect_alternatives(alternatives)
+        # Prepare the data of the recommended pairs of all incidents, remembering
+        # the position of every pair among the alternatives of its incident
+        learner_datas = []
+        pair_positions = []
         for assigned_pairs in transposed_pair_list:
-            learner_infos = []
             for i in range(len(assigned_pairs)):
                 learner_data = learner.prepare_data(
                     assigned_pairs[i], mas_df, clients_df
                 )
                 print(f"learner_data: {learner_data}")
-                if include_abnormality:
-                    learner_info = learner.predict_and_score(learner_data)
-                    shap_values = learner.get_explanation(learner_data)
-                    if learner_info[0] == 1:  # assignment is abnormal
-                        add_abnormality_comment(
-                            recommendation_ids[i],
-                            shap_values,
-                            learner_data[0],
-                            training_features_de,
-                        )
-                    learner_infos.append(learner_info)
-
-            try:
-                recommendation = send_update(
-                    request_info,
-                    assigned_pairs,
-                    recommendation_ids,
-                    client_record_assignments,
-                )
-            except Exception as e:
-                logger.error(f"Error while sending update: {e}")
-                continue
-
-            recommendations.append(recommendation)
+                learner_datas.append(learner_data)
+                pair_positions.append(i)
+        if include_abnormality and learner_datas:
+            # Score and explain the recommended pairs of all incidents at once
+            learner_infos, shap_values = learner.predict_score_and_explain(learner_datas)
+            for k, learner_info in enumerate(learner_infos):
+                if learner_info[0] == 1:  # assignment is abnormal
+                    add_abnormality_comment(
+                        recommendation_ids[pair_positions[k]],
+                        shap_values[k],
+                        learner_datas[k][0],
+                        training_features_de,
+                    )
+
+        # Push the changed recommendations of all incidents concurrently
+        try:
+            recommendations = send_updates(
+                request_info,
+                transposed_pair_list,
+                recommendation_ids,
+                client_record_assignments,
+                push_cache,
+            )
+        except Exception as e:
+            logger.error(f"Error while sending updates: {e}")
+            recommendations = []
 
         # Clear all old recommendations that are not in the new recommendations
         unassigned_incidents = filter_unassigned_incidents(
@@ -0,0 +1,101 @@
+import logging
+from typing import Dict, List, Optional
+
+from optimize.optimize import Optimizer
+
+logger = logging.getLogger(__name__)
+
+
+class AlternativesEngine:
+    """
+    Finds the best n distinct MA candidates for every open client.
+
+    The first candidate of every client comes from the optimal assignment.
+    Further candidates are found per client by re-solving the model (with the
+    Hungarian fast path or the warm OR-Tools solver) with the client's
+    previous candidates excluded and the client required to be
+    assigned (both as assumptions), starting from the optimal assignment as
+    solution hint. The MA the client gets in that re-solve is its next best
+    candidate that is still consistent with a good overall assignment.
+    """
+
+    def __init__(self, optimizer: Optimizer, n_alternatives: int = 3):
+        self.optimizer = optimizer
+        self.n_alternatives = n_alternatives
+
+    def solve(self, hint=None) -> Optional[Dict]:
+        """
+        Compute the ranked alternatives.
+
+        Args:
+            hint: Optional previous solution as set of (ma_id, client_id) pairs
+
+        Returns:
+            None if the model is infeasible, otherwise a dictionary with
+            - "alternatives": {client_id: [{"ma": ..., "klient": ...}, ...]}, best first
+            - "assigned_pairs_list": the assigned pairs of every rank
+            - "recommendation_ids": the recommendation id of every rank
+        """
+        objective_value = self.optimizer.solve_model(hint=hint)
+        if objective_value is None:
+            return None
+
+        best_pairs = self.optimizer.get_solution_pairs()
+        emp_ids = self.optimizer.employees["id"].tolist()
+        client_ids = self.optimizer.clients["id"].tolist()
+
+        candidates = {j: [i] for i, j in best_pairs}
+        if self.n_alternatives > 1:
+            self.optimizer.set_solution_hint(
+                {(emp_ids[i], client_ids[j]) for i, j in best_pairs}
+            )
+            for j, client_candidates in candidates.items():
+                self._extend_candidates(j, client_candidates)
+
+        assigned_pairs_list = []
+        recommendation_ids = []
+        for rank in range(self.n_alternatives):
+            ranked_pairs = [
+                (client_candidates[rank], j)
+                for j, client_candidates in candidates.items()
+                if len(client_candidates) > rank
+            ]
+            if rank > 0 and not ranked_pairs:
+                break
+            assigned_pairs, recommendation_id = self.optimizer.process_results(ranked_pairs)
+            assigned_pairs_list.append(assigned_pairs)
+            recommendation_ids.append(recommendation_id)
+
+        alternatives = {
+            client_ids[j]: [
+                {"ma": emp_ids[i], "klient": client_ids[j]} for i in client_candidates
+            ]
+            for j, client_candidates in candidates.items()
+        }
+
+        return {
+            "objective_value": objective_value,
+            "alternatives": alternatives,
+            "assigned_pairs_list": assigned_pairs_list,
+            "recommendation_ids": recommendation_ids,
+        }
+
+    def _extend_candidates(self, client_idx: int, client_candidates: List[int]) -> None:
+        """Append the next best MAs for a client until n candidates are found or none is left."""
+        while len(client_candidates) < self.n_alternatives:
+            excluded_pairs = [(i, client_idx) for i in client_candidates]
+            if not self.optimizer.solve_excluding(excluded_pairs, assigned_client=client_idx):
+                break
+            next_candidate = next(
+                (
+                    i
+                    for i, j in self.optimizer.get_solution_pairs()
+                    if j == client_idx
+                ),
+                None,
+            )
+            if next_candidate is None:
+                break
+            client_candidates.append(next_candidate)
+
+        logger.info(f"Client C{client_idx}: {len(client_candidates)} candidates found")
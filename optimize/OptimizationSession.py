@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from optimize.optimize import Optimizer
+from optimize.AlternativesEngine import AlternativesEngine
+
+logger = logging.getLogger(__name__)
+
+
+class OptimizationSession:
+    """
+    Keeps the optimization state alive across polling iterations.
+
+    If the day dataset (MA and client features) did not change, the existing
+    model is reused as is. Otherwise a new model is built for the changed set
+    of MAs and clients, which takes over the solved components of the
+    previous model's decomposition (see DecomposedAssignmentProblem): only
+    the components touched by changed incidents are solved again, including
+    the re-solves for the alternatives. For that, the cost terms of all
+    models of a day are standardized with the feature statistics of the
+    day's first model, otherwise any change would shift the costs of all
+    pairs. The last best solution, keyed by MA and client ids, is the
+    solution hint of the CP-SAT backends ("ortools", "cpmpy" and "auto" with
+    side constraints); the Hungarian method of the "auto" backend is exact
+    and does not use it.
+    """
+
+    def __init__(self, abnormality_model=None):
+        self.abnormality_model = abnormality_model
+        self.optimizer = None
+        self.dataset_fingerprint = None
+        self.day = None
+        self.feature_stats = None
+        self.previous_solution: Set[Tuple[str, str]] = set()
+
+    def get_optimizer(
+        self, mas_df: pd.DataFrame, clients_df: pd.DataFrame, abnormality_model=None, day=None
+    ) -> Optimizer:
+        """
+        Return an optimizer with a model for the given day dataset.
+
+        Args:
+            mas_df: MA features of the free MAs
+            clients_df: Client features of the open clients
+            abnormality_model: Optional model replacing the session's model
+            day: Optional date of the dataset, feature statistics and solved
+                components are only kept within the same day
+        """
+        if abnormality_model is not None:
+            self.abnormality_model = abnormality_model
+        if day != self.day:
+            self.day = day
+            self.feature_stats = None
+            self.optimizer = None
+
+        fingerprint = dataset_fingerprint(mas_df, clients_df)
+
+        if self.optimizer is not None and fingerprint == self.dataset_fingerprint:
+            logger.info("Day dataset unchanged, reusing optimization model")
+            self.optimizer.reset_solver()
+            return self.optimizer
+
+        previous_decomposition = self.optimizer.decomposition if self.optimizer is not None else None
+        self.optimizer = Optimizer(
+            mas_df, clients_df, self.abnormality_model, feature_stats=self.feature_stats
+        )
+        self.optimizer.create_model()
+        self.feature_stats = self.optimizer.feature_stats
+        if previous_decomposition is not None:
+            self.optimizer.reuse_decomposition(previous_decomposition)
+        self.dataset_fingerprint = fingerprint
+
+        return self.optimizer
+
+    def solve(self, min_objective_value=None):
+        """Solve the current model, with the previous solution as hint for CP-SAT."""
+        return self.optimizer.solve_model(min_objective_value, hint=self.previous_solution)
+
+    def solve_alternatives(self, n_alternatives: int = 3) -> Optional[Dict]:
+        """
+        Compute the best n MA candidates per client.
+
+        Unchanged components keep their candidates of the previous iteration.
+        The best assignment is remembered as hint for the next iteration.
+        """
+        result = AlternativesEngine(self.optimizer, n_alternatives).solve(
+            hint=self.previous_solution
+        )
+        if result is not None and result["assigned_pairs_list"]:
+            self.remember_solution(result["assigned_pairs_list"][0])
+
+        return result
+
+    def remember_solution(self, assigned_pairs: List[Dict]) -> None:
+        """Store the best assignment as hint for the next iteration."""
+        self.previous_solution = {
+            (pair["ma"], pair["klient"]) for pair in assigned_pairs
+        }
+
+
+def dataset_fingerprint(mas_df: pd.DataFrame, clients_df: pd.DataFrame) -> str:
+    """Stable hash of the content of the MA and client feature DataFrames."""
+    digest = hashlib.sha1()
+    for df in (mas_df, clients_df):
+        digest.update(
+            json.dumps(df.to_dict(orient="records"), sort_keys=True, default=str).encode("utf-8")
+        )
+
+    return digest.hexdigest()
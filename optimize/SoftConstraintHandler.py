@@ -1,21 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-import json
+from cpmpy.expressions.core import Operator
 from learning.model import AbnormalityModel
-from datetime import datetime
 
 # To ensure that the minimized value is high and can be converted to ints for using it to set constraints
 scaling_factor = 1000000
 
-from config import include_abnormality
+from config import include_abnormality, abnormality_score_workers
 
-from optimize.soft_constraint_handling.stat_computations import (
-    compute_travel_time_stats,
-    compute_time_window_stats,
-    compute_priority_stats,
-    compute_availability_gap_stats,
-    compute_short_term_client_experience_stats,
-    compute_client_experience_stats,
-    compute_school_experience_stats,
+from optimize.soft_constraint_handling.stat_computations import compute_feature_stats
+from optimize.soft_constraint_handling.cost_matrices import (
+    cost_terms,
+    build_feature_matrices,
+    build_cost_matrix,
 )
 
 
@@ -30,6 +28,8 @@ class SoftConstrainedHandler:
         abnormality_model: AbnormalityModel,
         learner_dataset=None,
         weights=None,
+        travel_times=None,
+        feature_stats=None,
     ):
         self.employees = employees
         self.clients = clients
@@ -38,27 +38,25 @@ class SoftConstrainedHandler:
         self.model = model
         self.learner_dataset = learner_dataset
         self.abnormality_model = abnormality_model
+        self.pairs = list(self.assignments.keys())
 
-        # Compute feature statistics for standardization
-        self.travel_time_mean, self.travel_time_std = compute_travel_time_stats(
-            self.employees, self.clients
-        )
-        self.time_window_mean, self.time_window_std = compute_time_window_stats(
-            self.employees, self.clients
-        )
-        self.priority_mean, self.priority_std = compute_priority_stats(self.clients)
-        self.availability_gap_mean, self.availability_gap_std = (
-            compute_availability_gap_stats(self.employees, self.clients)
+        # Dense feature matrices, their statistics for standardization
+        # and the per-pair cost matrix, each computed once
+        self.feature_matrices = build_feature_matrices(
+            self.employees, self.clients, travel_times
         )
-        (
-            self.short_term_client_experience_mean,
-            self.short_term_client_experience_std,
-        ) = compute_short_term_client_experience_stats(self.employees)
-        self.client_experience_mean, self.client_experience_std = (
-            compute_client_experience_stats(self.employees)
+        self.feature_stats = compute_feature_stats(
+            self.employees, self.clients, self.feature_matrices
         )
-        self.school_experience_mean, self.school_experience_std = (
-            compute_school_experience_stats(self.employees)
+        if feature_stats:
+            # Keep given statistics (e.g. of an earlier model of the day) for
+            # all features they define, so unchanged pairs keep their costs
+            self.feature_stats = {
+                feature: feature_stats[feature] if feature_stats.get(feature, (0, 0))[1] > 0 else stats
+                for feature, stats in self.feature_stats.items()
+            }
+        self.cost_matrix = build_cost_matrix(
+            self.feature_matrices, self.feature_stats, self.pairs, scaling_factor
         )
 
         # Weights for each objective (default values if not provided)
@@ -74,187 +72,83 @@ class SoftConstrainedHandler:
             "availability_gap": 100,
         }
 
-    def _compute_abnormality(self, i, j):
-        """Compute abnormality of employee-client pair."""
-        pair_features = self.learner_dataset[(i, j)]
-
-        datapoint = list(pair_features.values())
-
-        score = self.abnormality_model.score_samples([datapoint])[0]
-
-        int_score = int(round(score * scaling_factor))
-        # return negative score to minimize
-        return -int_score
-
-    def _compute_short_term_client_experience(self, i, j):
-        """Compute short term client experience score for assignment (i,j)."""
-        employee = self.employees.iloc[i]
-        client_id = self.clients.iloc[j]["id"]
-        short_term_experience = employee["short_term_cl_experience"].get(
-            client_id, 0
-        )
-        normalized_experience = self._normalize(
-            short_term_experience,
-            self.short_term_client_experience_mean,
-            self.short_term_client_experience_std,
-        )
-        scaled_experience = int(round(-normalized_experience * scaling_factor))
-        return self.assignments[(i, j)] * scaled_experience
-
-    def _compute_client_experience(self, i, j):
-        """Compute client experience score for assignment (i,j)."""
-        employee = self.employees.iloc[i]
-        client_id = self.clients.iloc[j]["id"]
-        client_experience = employee["cl_experience"].get(client_id, 0)
-        normalized_experience = self._normalize(
-            client_experience, self.client_experience_mean, self.client_experience_std
-        )
-        scaled_experience = int(round(-normalized_experience * scaling_factor))
-        return self.assignments[(i, j)] * scaled_experience
-
-    def _compute_school_experience(self, i, j):
-        """Compute school experience score for assignment (i,j)."""
-        employee = self.employees.iloc[i]
-        client_school = self.clients.iloc[j]["school"]
-        school_experience = employee["school_experience"].get(
-            client_school, 0
-        )
-        normalized_experience = self._normalize(
-            school_experience, self.school_experience_mean, self.school_experience_std
-        )
-        scaled_experience = int(round(-normalized_experience * scaling_factor))
-        return self.assignments[(i, j)] * scaled_experience
-
-    def _normalize(self, value, mean, std):
-        """Normalize value using z-score normalization."""
-        return (value - mean) / std if std > 0 else 0
-
-    def _get_travel_time_term(self, i, j):
-        """Normalized travel time term for assignment (i,j)."""
-        employee = self.employees.iloc[i]
-        client_school = self.clients.iloc[j]["school"]
-        time_to_school = json.loads(employee["timeToSchool"]).get(client_school, 0)
-        normalized_time = self._normalize(
-            time_to_school, self.travel_time_mean, self.travel_time_std
-        )
-
-        # Scale and round to integer
-        scaled_time = int(round(normalized_time * scaling_factor))
-
-        return self.assignments[(i, j)] * scaled_time
-
-    def _get_time_window_diff_term(self, i, j):
-        """Normalized time window difference term for assignment (i,j)."""
-        employee_avail_end = self.employees.iloc[i]["availability"][1]
-        client_time_window = self.clients.iloc[j]["timeWindow"]
-
-        if client_time_window is None:
-            return 0  # No penalty if client has no time window
-
-        client_time_end = client_time_window[1]
-        time_diff = employee_avail_end - client_time_end
-        normalized_diff = self._normalize(
-            time_diff, self.time_window_mean, self.time_window_std
-        )
-
-        # Scale and round to integer
-        scaled_diff = int(round(normalized_diff * scaling_factor))
-
-        return self.assignments[(i, j)] * scaled_diff
-
-    def _get_priority_term(self, i, j):
-        """Normalized priority term for assignment (i,j)."""
-        client_priority = self.clients.iloc[j]["priority"]
-        normalized_priority = self._normalize(
-            client_priority, self.priority_mean, self.priority_std
-        )
-
-        # Scale and round to integer
-        scaled_priority = int(round(normalized_priority * scaling_factor))
-
-        return self.assignments[(i, j)] * scaled_priority
+    def _compute_abnormalities(self):
+        """
+        Abnormality of all pairs, aligned with self.pairs.
+
+        The features of all pairs are stacked into one float matrix and scored
+        with a single score_samples call (split into one chunk per worker if
+        config.abnormality_score_workers > 1), instead of one call per pair.
+        """
+        if not self.pairs:
+            return np.zeros(0, dtype=np.int64)
+
+        datapoints = np.array(
+            [
+                [np.nan if value is None else value for value in self.learner_dataset[pair].values()]
+                for pair in self.pairs
+            ],
+            dtype=float,
+        )
+
+        n_chunks = min(abnormality_score_workers, len(datapoints))
+        if n_chunks > 1:
+            with ThreadPoolExecutor(max_workers=n_chunks) as executor:
+                scores = np.concatenate(
+                    list(
+                        executor.map(
+                            self.abnormality_model.score_samples,
+                            np.array_split(datapoints, n_chunks),
+                        )
+                    )
+                )
+        else:
+            scores = self.abnormality_model.score_samples(datapoints)
+
+        # return negative score to minimize (rint rounds half to even like round)
+        return -np.rint(scores * scaling_factor).astype(np.int64)
+
+    def get_pair_coefficients(self):
+        """
+        Weighted objective coefficient of every assignment variable.
+
+        The cost matrix is computed once; re-tuning the weights only requires
+        another matrix-vector product.
+        """
+        weight_vector = np.array(
+            [self.weights[term] for term in cost_terms], dtype=np.int64
+        )
+        coefficients = self.cost_matrix @ weight_vector
+        if include_abnormality:
+            coefficients += self.weights["abnormality"] * self._compute_abnormalities()
+        return coefficients
 
-    def _compute_availability_gap(self, i, j):
-        """Availability gap term for assignment (i,j)."""
-        employee = self.employees.iloc[i]
-        client = self.clients.iloc[j]
-        availability_gap = datetime.strptime(
-            employee["available_until"], "%Y-%m-%d"
-        ) - datetime.strptime(client["available_until"], "%Y-%m-%d")
-        normalized_gap = self._normalize(
-            availability_gap, self.availability_gap_mean, self.availability_gap_std
-        )
-        scaled_gap = int(round(-normalized_gap * scaling_factor))
-        return self.assignments[(i, j)] * scaled_gap
+    def get_unassigned_cost(self):
+        """Objective coefficient of every unassigned client."""
+        return self.weights["unassigned"] * scaling_factor
 
     def _compute_unassigned_objective(self):
         """Objective 1: Minimize unassigned clients."""
-        return (
-            self.weights["unassigned"] * sum(self.unassigned_clients) * scaling_factor
-        )
-
-    def _compute_travel_time_objective(self):
-        """Objective 2: Minimize total normalized travel time."""
-        return self.weights["travel_time"] * sum(
-            self._get_travel_time_term(i, j) for (i, j) in self.assignments
-        )
-
-    def _compute_time_window_objective(self):
-        """Objective 3: Minimize total time window differences."""
-        return self.weights["time_window"] * sum(
-            self._get_time_window_diff_term(i, j) for (i, j) in self.assignments
-        )
+        return self.get_unassigned_cost() * sum(self.unassigned_clients)
 
-    def _compute_priority_objective(self):
-        """Objective 4: Minimize total priority scores of assigned clients."""
-        return self.weights["priority"] * sum(
-            self._get_priority_term(i, j) for (i, j) in self.assignments
-        )
-
-    def _compute_abnormality_objective(self):
-        """Objective 5: Minimize total abnormality scores of assigned clients."""
-        return self.weights["abnormality"] * sum(
-            self._compute_abnormality(i, j) for (i, j) in self.assignments
-        )
-
-    def _compute_client_experience_objective(self):
-        """Objective 6: Minimize total client experience scores."""
-        return self.weights["client_experience"] * sum(
-            self._compute_client_experience(i, j) for (i, j) in self.assignments
-        )
-
-    def _compute_school_experience_objective(self):
-        """Objective 7: Minimize total school experience scores."""
-        return self.weights["school_experience"] * sum(
-            self._compute_school_experience(i, j) for (i, j) in self.assignments
-        )
-
-    def _compute_short_term_client_experience_objective(self):
-        """Objective 8: Minimize total short term client experience scores."""
-        return self.weights["short_term_client_experience"] * sum(
-            self._compute_short_term_client_experience(i, j)
-            for (i, j) in self.assignments
-        )
-
-    def _compute_availability_gap_objective(self):
-        """Objective 9: Minimize total availability gaps."""
-        return self.weights["availability_gap"] * sum(
-            self._compute_availability_gap(i, j) for (i, j) in self.assignments
+    def _compute_assignment_objective(self):
+        """Objectives 2-9: Weighted sum of all pair costs as one linear expression."""
+        self.pair_coefficients = self.get_pair_coefficients()
+        if not self.pairs:
+            return 0
+        return Operator(
+            "wsum",
+            [
+                self.pair_coefficients.tolist(),
+                [self.assignments[pair] for pair in self.pairs],
+            ],
         )
 
     def set_up_objectives(self):
         """Combine and set all optimization objectives in the model."""
         total_objective = (
             self._compute_unassigned_objective()
-            + self._compute_travel_time_objective()
-            + self._compute_time_window_objective()
-            + self._compute_priority_objective()
-            + self._compute_client_experience_objective()
-            + self._compute_school_experience_objective()
-            + self._compute_short_term_client_experience_objective()
-            + self._compute_availability_gap_objective()
+            + self._compute_assignment_objective()
         )
-        if include_abnormality:
-            total_objective += self._compute_abnormality_objective()
         self.model.minimize(total_objective)
         return self.model
@@ -1,15 +1,29 @@
 import cpmpy as cp
+import numpy as np
 import pandas as pd
-import json
-from optimize.utils.has_required_qualifications import has_required_qualifications
+from optimize.utils.eligibility import compute_eligibility, eligible_pairs
+from optimize.utils.linear_assignment import solve_linear_assignment
+from optimize.utils.cp_sat_model import CpSatAssignmentModel, get_solve_stats
+from optimize.utils.decomposition import DecomposedAssignmentProblem
 from optimize.SoftConstraintHandler import SoftConstrainedHandler
 import logging
 from utils.append_to_json_file import append_to_json_file
 from utils.add_comment import add_ai_comment, add_employee_comment, add_customer_comment
 import uuid
-from typing import Dict
+import time
+from typing import Dict, List, Tuple
 from datetime import datetime
 from utils.base_availability import base_availability
+from utils.day_ordinals import to_day_ordinals
+
+from config import (
+    solver_backend,
+    solver_time_limit,
+    solver_num_workers,
+    solver_relative_gap,
+    solver_decompose,
+    solver_decomposition_workers,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -17,41 +31,65 @@ logger = logging.getLogger(__name__)
 class Optimizer:
 
     def __init__(
-        self, employees: pd.DataFrame, clients: pd.DataFrame, abnormality_model
+        self,
+        employees: pd.DataFrame,
+        clients: pd.DataFrame,
+        abnormality_model,
+        solver_backend: str = solver_backend,
+        feature_stats: Dict = None,
     ):
         # Define variables for employee self.assignments and client unassignment indicators
         self.assignments = {}
         self.unassigned_clients = []
         # Model instance
         self.model = cp.Model()
+        self.solver = None
+        self.cp_sat_model = None
+        self.decomposition = None
+        self.previous_decomposition = None
+        self.has_side_constraints = False
+        self.hint = None
+        self.solution_pairs = []
+        self.solve_stats = None
+        self.last_solve_stats = None
         self.abnormality_model = abnormality_model
+        self.solver_backend = solver_backend
+        # Standardization statistics of the cost terms, computed by the handler if not given
+        self.feature_stats = feature_stats
 
         self.employees = employees
         self.clients = clients
 
     def create_model(self):
 
-        self.learner_dataset = {}
-
-        # Create decision variables and filter based on eligibility
-        for i, emp in self.employees.iterrows():
-            for j, client in self.clients.iterrows():
-                if client["school"] in json.loads(
-                    emp["timeToSchool"]
-                ) and has_required_qualifications(
-                    emp["qualifications"], client["neededQualifications"]
-                ) and (emp["id"] not in [elem["id"] for elem in client["ma_blacklist"]]):
-                    # Define a binary variable for this assignment
-                    self.assignments[(i, j)] = cp.boolvar(name=f"assign_E{i}_C{j}")
-                    self.assignments[(i, j)].set_description(
-                        f"E{i} is assigned to C{j}"
-                    )
-                    self.learner_dataset[(i, j)] = self.process_employee_client_pair(
-                        i, j
-                    )
+        # Precompute eligibility (school reachability, qualifications, blacklist)
+        # for all employee/client pairs in one vectorized pass
+        eligible, self.travel_times = compute_eligibility(self.employees, self.clients)
+        self.eligible_pairs = eligible_pairs(eligible)
+
+        self.learner_dataset = self.build_learner_dataset(self.eligible_pairs)
 
         # print("learner_dataset: ", self.learner_dataset)
 
+        if self.solver_backend == "ortools":
+            self._create_cp_sat_model()
+        else:
+            self._create_cpmpy_model()
+
+    def _create_cpmpy_model(self):
+
+        # Create decision variables for the admissible pairs only
+        for i, j in self.eligible_pairs:
+            # Define a binary variable for this assignment
+            self.assignments[(i, j)] = cp.boolvar(name=f"assign_E{i}_C{j}")
+            self.assignments[(i, j)].set_description(f"E{i} is assigned to C{j}")
+
+        employee_vars = [[] for _ in range(len(self.employees))]
+        client_vars = [[] for _ in range(len(self.clients))]
+        for (i, j), var in self.assignments.items():
+            employee_vars[i].append(var)
+            client_vars[j].append(var)
+
         # Create binary variables to represent unassigned clients
         for j in range(len(self.clients)):
             unassigned_var = cp.boolvar(name=f"unassigned_C{j}")
@@ -60,15 +98,7 @@ class Optimizer:
 
         # Primary Objective: Minimize the number of unassigned clients
         for j in range(len(self.clients)):
-            self.model += [
-                self.unassigned_clients[j]
-                == 1
-                - sum(
-                    self.assignments[(i, j)]
-                    for i in range(len(self.employees))
-                    if (i, j) in self.assignments
-                )
-            ]
+            self.model += [self.unassigned_clients[j] == 1 - sum(client_vars[j])]
 
         soft_constrained_handler = SoftConstrainedHandler(
             self.employees,
@@ -78,81 +108,310 @@ class Optimizer:
             self.model,
             self.abnormality_model,
             self.learner_dataset,
+            travel_times=self.travel_times,
+            feature_stats=self.feature_stats,
         )
         self.model = soft_constrained_handler.set_up_objectives()
+        # Linear objective terms, used by the assignment problem fast path
+        self.pair_costs = soft_constrained_handler.pair_coefficients
+        self.feature_stats = soft_constrained_handler.feature_stats
+        self.unassigned_cost = soft_constrained_handler.get_unassigned_cost()
 
         # Constraints: Each employee and client can only be assigned once
         # Each employee can only be assigned to one client
-        for i in range(len(self.employees)):
-            self.model += [
-                sum(
-                    self.assignments[(i, j)]
-                    for j in range(len(self.clients))
-                    if (i, j) in self.assignments
-                )
-                <= 1
-            ]
+        for variables in employee_vars:
+            if variables:
+                self.model += [sum(variables) <= 1]
 
         # Each client can only be assigned to one employee
-        for j in range(len(self.clients)):
-            self.model += [
-                sum(
-                    self.assignments[(i, j)]
-                    for i in range(len(self.employees))
-                    if (i, j) in self.assignments
-                )
-                <= 1
-            ]
+        for variables in client_vars:
+            if variables:
+                self.model += [sum(variables) <= 1]
+
+    def _create_cp_sat_model(self):
 
-    def solve_model(self, min_objective_value=None):
+        # Only the objective coefficients are taken from the handler, the
+        # model itself is built directly in CP-SAT
+        soft_constrained_handler = SoftConstrainedHandler(
+            self.employees,
+            self.clients,
+            dict.fromkeys(self.eligible_pairs),
+            self.unassigned_clients,
+            None,
+            self.abnormality_model,
+            self.learner_dataset,
+            travel_times=self.travel_times,
+            feature_stats=self.feature_stats,
+        )
+        self.pair_costs = soft_constrained_handler.get_pair_coefficients()
+        self.feature_stats = soft_constrained_handler.feature_stats
+        self.unassigned_cost = soft_constrained_handler.get_unassigned_cost()
+
+    def solve_model(self, min_objective_value=None, hint=None):
+        """
+        Solve the model.
+
+        With the "auto" backend, the model is solved with the Hungarian method
+        as long as it is a pure weighted bipartite matching and with OR-Tools
+        via cpmpy once side constraints (objective bounds) are added. The
+        "cpmpy" backend always uses OR-Tools via cpmpy, the "ortools" backend
+        the model built directly in CP-SAT. Without side constraints, the
+        "auto" and "ortools" backends solve every connected component of the
+        eligibility graph separately (see config.solver_decompose), taking
+        over the unchanged components of reuse_decomposition. Translated
+        solvers are kept for the
+        lifetime of this optimization run, so repeated solves (e.g. for
+        alternatives) reuse them. OR-Tools solves respect the solve budget of
+        the config and may return a feasible, not proven optimal solution; the
+        status and search statistics are kept in self.solve_stats.
+
+        Args:
+            min_objective_value: Optional bound the objective has to exceed
+            hint: Optional previous solution as set of (ma_id, client_id) pairs,
+                passed to CP-SAT as solution hint
+        """
         print(f"min objective: {min_objective_value}")
+        if hint:
+            self.set_solution_hint(hint)
         if min_objective_value != None:
-            # self.model = cp.Model(self.model.constraints)
-            # print(f"objective value: {self.model.objective_value()}")
-            # print(f"objective: {self.model.objective_}")
-            self.model += self.model.objective_ > min_objective_value
-        if self.model.solve(solver="ortools"):
+            if self.solver_backend == "ortools":
+                self._get_cp_sat_model().add_objective_bound(min_objective_value)
+            else:
+                self._get_solver()
+                self.solver += self.model.objective_ > min_objective_value
+            self.has_side_constraints = True
+
+        objective_value = self._solve()
+        self.solve_stats = self.last_solve_stats
+
+        if objective_value is None:
+            logger.info("No feasible solution found.")
+            print("No feasible solution found.")
+            return None
+
+        if self.solve_stats["status"] == "optimal":
             logger.info("Optimal solution found!")
             print("Optimal solution found!")
-            try:
-                print(f"new min objective value try: {self.model.objective_value()}")
-            except:
-                print(f"new min objective value except: {self.model.objective_}")
         else:
-            logger.info("No feasible solution found.")
-            print("No feasible solution found.")
+            logger.info(f"Feasible solution found, not proven optimal: {self.solve_stats}")
+            print("Feasible solution found, not proven optimal.")
+        print(f"new min objective value: {objective_value}")
+        return objective_value
+
+    def solve_excluding(self, excluded_pairs: List[Tuple[int, int]], assigned_client: int = None) -> bool:
+        """
+        Re-solve with the given pairs forbidden.
+
+        For OR-Tools the exclusions are passed as assumptions, so they only
+        hold for this solve and do not accumulate in the solver. With the
+        decomposed model, only the component of assigned_client is re-solved.
+
+        Args:
+            excluded_pairs: (employee index, client index) pairs that must not be assigned
+            assigned_client: Optional index of a client that has to be assigned
+        """
+        return self._solve(excluded_pairs, assigned_client) is not None
+
+    def set_solution_hint(self, hint) -> None:
+        """Use a set of (ma_id, client_id) pairs as solution hint for OR-Tools."""
+        self.hint = hint
+
+    def reuse_decomposition(self, decomposition: DecomposedAssignmentProblem) -> None:
+        """Take over the solved components of a previous model that are unchanged in this one."""
+        self.previous_decomposition = decomposition
+
+    def reset_solver(self):
+        """Drop the solvers (and all bounds added to them), keeping the model."""
+        self.solver = None
+        self.cp_sat_model = None
+        self.has_side_constraints = False
+
+    def _get_solver(self):
+        if self.solver is None:
+            self.solver = cp.SolverLookup.get("ortools", self.model)
+        return self.solver
+
+    def _get_decomposition(self) -> DecomposedAssignmentProblem:
+        if self.decomposition is None:
+            self.decomposition = DecomposedAssignmentProblem(
+                self.eligible_pairs,
+                self.pair_costs,
+                self.unassigned_cost,
+                len(self.employees),
+                len(self.clients),
+                backend=self.solver_backend,
+                max_workers=solver_decomposition_workers,
+                solve_budget={
+                    "time_limit": solver_time_limit,
+                    "num_workers": solver_num_workers,
+                    "relative_gap": solver_relative_gap,
+                },
+                employee_ids=self.employees["id"].tolist(),
+                client_ids=self.clients["id"].tolist(),
+                previous=self.previous_decomposition,
+            )
+            self.previous_decomposition = None
+            logger.info(
+                f"Assignment problem decomposed into {len(self.decomposition.components)} components"
+            )
+        return self.decomposition
+
+    def _get_cp_sat_model(self) -> CpSatAssignmentModel:
+        if self.cp_sat_model is None:
+            self.cp_sat_model = CpSatAssignmentModel(
+                self.eligible_pairs,
+                self.pair_costs,
+                self.unassigned_cost,
+                len(self.employees),
+                len(self.clients),
+                time_limit=solver_time_limit,
+                num_workers=solver_num_workers,
+                relative_gap=solver_relative_gap,
+            )
+        return self.cp_sat_model
+
+    def _solve(self, excluded_pairs=(), assigned_client=None):
+        """Solve with the configured backend and store the solution pairs and solve statistics."""
+        start = time.perf_counter()
+        if (
+            solver_decompose
+            and self.solver_backend in ("auto", "ortools")
+            and not self.has_side_constraints
+        ):
+            decomposition = self._get_decomposition()
+            hint_values = self._hint_pair_values(self.hint) if self.hint else None
+            if assigned_client is not None:
+                result, self.last_solve_stats = decomposition.resolve_for_client(
+                    excluded_pairs, assigned_client, hint_values
+                )
+            else:
+                result, self.last_solve_stats = decomposition.solve(
+                    hint_values, excluded_pairs
+                )
+            self.last_solve_stats["objective_value"] = (
+                result[1] if result is not None else None
+            )
+        elif self.solver_backend == "ortools":
+            cp_sat_model = self._get_cp_sat_model()
+            result = cp_sat_model.solve(
+                self._hint_pair_values(self.hint) if self.hint else None,
+                excluded_pairs,
+                assigned_client,
+            )
+            self.last_solve_stats = cp_sat_model.get_solve_stats()
+        elif self.solver_backend == "auto" and not self.has_side_constraints:
+            result = solve_linear_assignment(
+                self.eligible_pairs,
+                self.pair_costs,
+                self.unassigned_cost,
+                len(self.employees),
+                len(self.clients),
+                excluded_pairs,
+                assigned_client,
+            )
+            # The Hungarian method always returns an optimal matching
+            self.last_solve_stats = {
+                "status": "optimal" if result is not None else "infeasible",
+                "wall_time": time.perf_counter() - start,
+                "objective_value": result[1] if result is not None else None,
+                "best_bound": result[1] if result is not None else None,
+            }
+        else:
+            result = self._solve_cpmpy(excluded_pairs, assigned_client)
+            self.last_solve_stats = get_solve_stats(
+                self.solver.ort_solver, self.solver.ort_status
+            )
+        self.last_solve_stats["backend"] = self.solver_backend
+
+        if result is None:
+            return None
+        self.solution_pairs, objective_value = result
+        return objective_value
+
+    def _solve_cpmpy(self, excluded_pairs=(), assigned_client=None):
+        solver = self._get_solver()
+        if self.hint:
+            solver.solution_hint(*self._hint_values(self.hint))
+        assumptions = [~self.assignments[pair] for pair in excluded_pairs]
+        if assigned_client is not None:
+            assumptions.append(~self.unassigned_clients[assigned_client])
+        if not solver.solve(
+            time_limit=solver_time_limit,
+            assumptions=assumptions,
+            num_search_workers=solver_num_workers,
+            relative_gap_limit=solver_relative_gap,
+        ):
             return None
-        try:
-            return self.model.objective_value()
-        except Exception as e:
-            print(f"Error: {e}")
-            return self.model.objective_
+        solution_pairs = [
+            (i, j) for (i, j), var in self.assignments.items() if var.value() == 1
+        ]
+        return solution_pairs, solver.objective_value()
+
+    def _hint_pair_values(self, hint) -> List[int]:
+        """Map a set of (ma_id, client_id) pairs onto 0/1 values of the admissible pairs."""
+        emp_ids = self.employees["id"].tolist()
+        client_ids = self.clients["id"].tolist()
+
+        return [
+            int((emp_ids[i], client_ids[j]) in hint) for i, j in self.eligible_pairs
+        ]
+
+    def _hint_values(self, hint):
+        """Map a set of (ma_id, client_id) pairs onto values of the cpmpy decision variables."""
+        variables = []
+        values = []
+        hinted_clients = set()
+        for (i, j), value in zip(self.eligible_pairs, self._hint_pair_values(hint)):
+            if value:
+                hinted_clients.add(j)
+            variables.append(self.assignments[(i, j)])
+            values.append(value)
+        for j, var in enumerate(self.unassigned_clients):
+            variables.append(var)
+            values.append(int(j not in hinted_clients))
+
+        return variables, values
+
+    def get_solution_pairs(self) -> List[Tuple[int, int]]:
+        """(employee index, client index) pairs assigned in the current solution."""
+        return self.solution_pairs
+
+    def process_results(self, pairs: List[Tuple[int, int]] = None):
+        """
+        Log and store a set of assignments and comment it under a new recommendation id.
+
+        Args:
+            pairs: (employee index, client index) pairs to process, defaults
+                to the pairs of the current solution
+        """
+        if pairs is None:
+            pairs = self.get_solution_pairs()
 
-    def process_results(self):
         store_dict = {
             "assigned_pairs": None,
             "unassigned_clients": None,
             "avg_travel_time": None,
             "avg_priority": None,
+            "solver_stats": self.solve_stats,
         }
         assigned_pairs = []
-        for (i, j), var in self.assignments.items():
-            if var.value() == 1:
-                assigned_pairs.append(
-                    {
-                        "ma": self.employees.iloc[i]["id"],
-                        "klient": self.clients.iloc[j]["id"],
-                    }
-                )
-                print(
-                    f"Employee {self.employees.iloc[i]['id']} assigned to Client {self.clients.iloc[j]['id']}"
-                )
+        for i, j in pairs:
+            assigned_pairs.append(
+                {
+                    "ma": self.employees.iloc[i]["id"],
+                    "klient": self.clients.iloc[j]["id"],
+                }
+            )
+            print(
+                f"Employee {self.employees.iloc[i]['id']} assigned to Client {self.clients.iloc[j]['id']}"
+            )
 
         # Output the unassigned clients
+        assigned_client_idx = {j for _, j in pairs}
         unassigned_clients_list = [
             self.clients.iloc[j]["id"]
             for j in range(len(self.clients))
-            if self.unassigned_clients[j].value() == 1
+            if j not in assigned_client_idx
         ]
 
         print("\nUnassigned Clients:")
@@ -160,33 +419,21 @@ class Optimizer:
         store_dict["assigned_pairs"] = assigned_pairs
         store_dict["unassigned_clients"] = unassigned_clients_list
 
-        # Display total travel time and time window difference for the optimal solution
-        total_travel_time = [
-            var.value()
-            * json.loads(self.employees.iloc[i]["timeToSchool"])[
-                self.clients.iloc[j]["school"]
-            ]
-            for (i, j), var in self.assignments.items()
-            if var.value() == 1
-        ]
-        # total_priority = [var.value() * self.clients.iloc[j]["priority"] for (i, j), var in self.assignments.items() if var.value() == 1]
-        total_priority = [
-            self.clients.to_dict()["priority"][j]
-            for (i, j), var in self.assignments.items()
-            if var.value() == 1
-        ]
+        # Display total travel time and time window difference for the solution
+        total_travel_time = [self.travel_times[i, j].item() for i, j in pairs]
+        priorities = self.clients["priority"].tolist()
+        total_priority = [priorities[j] for _, j in pairs]
         total_time_window_diff = []
 
-        for (i, j), var in self.assignments.items():
-            if var.value() == 1:
-                availability_end = self.employees.iloc[i]["availability"][1]
-                kl_time_window = self.clients.iloc[j]["timeWindow"]
-                if kl_time_window is None:
-                    time_window_end = availability_end
-                else:
-                    time_window_end = kl_time_window[1]
-                diff = var.value() * availability_end - time_window_end
-                total_time_window_diff.append(diff)
+        for i, j in pairs:
+            availability_end = self.employees.iloc[i]["availability"][1]
+            kl_time_window = self.clients.iloc[j]["timeWindow"]
+            if kl_time_window is None:
+                time_window_end = availability_end
+            else:
+                time_window_end = kl_time_window[1]
+            diff = availability_end - time_window_end
+            total_time_window_diff.append(diff)
 
         print(f"travel times: {total_travel_time}")
         # print(f"window diff times: {total_time_window_diff}")
@@ -217,49 +464,74 @@ class Optimizer:
 
         return uuid.uuid4()
 
-    def process_employee_client_pair(self, emp_idx: int, client_idx: int) -> Dict:
+    def build_learner_dataset(self, pairs: List[Tuple[int, int]]) -> Dict:
         """
-        Process a single employee-client pair and store their features if they are a valid match.
+        Build the features of all admissible employee-client pairs at once.
+
+        Column values are extracted from the DataFrames once and indexed by
+        position, instead of looking up both rows for every pair.
 
         Args:
-            emp_idx: Index of the employee in the employees DataFrame
-            client_idx: Index of the client in the clients DataFrame
+            pairs: Admissible (employee index, client index) pairs
         """
-        emp = self.employees.iloc[emp_idx]
-        client = self.clients.iloc[client_idx]
-
-        # convert emp["available_until"] to a human readable format, such as 01.01.2025
-        available_until_ma = (
-            datetime.strptime(emp["available_until"], "%Y-%m-%d")
-            if emp["available_until"] is not None
-            else "unbekannt"
-        )
-        available_until_client = (
-            datetime.strptime(client["available_until"], "%Y-%m-%d")
-            if client["available_until"] is not None
-            else "unbekannt"
-        )
-        add_employee_comment(emp["id"], f"Mitarbeiter frei bis: {available_until_ma}")
-        add_customer_comment(
-            client["id"], f"Klient zu vertreten bis: {available_until_client}"
+        self._add_availability_comments(pairs)
+
+        client_ids = self.clients["id"].tolist()
+        client_schools = self.clients["school"].tolist()
+        priorities = self.clients["priority"].tolist()
+        sex_relevant = [sex != None for sex in self.clients["requiredSex"]]
+        cl_experience = self.employees["cl_experience"].tolist()
+        short_term_cl_experience = self.employees["short_term_cl_experience"].tolist()
+        school_experience = self.employees["school_experience"].tolist()
+        ma_availability = [
+            availability == base_availability
+            for availability in self.employees["availability"]
+        ]
+        mobility = self.employees["hasCar"].tolist()
+
+        availability_gaps = (
+            to_day_ordinals(self.employees["available_until"])[:, np.newaxis]
+            - to_day_ordinals(self.clients["available_until"])[np.newaxis, :]
         )
 
-        if available_until_ma is not None and available_until_client is not None:
-            availability_gap = available_until_ma - available_until_client
-        else:
-            availability_gap = None
-
-        return {
-            "timeToSchool": json.loads(emp["timeToSchool"]).get(client["school"]),
-            "cl_experience": emp["cl_experience"].get(client["id"], 0),
-            "short_term_cl_experience": emp["short_term_cl_experience"].get(client["id"], 0),
-            "school_experience": emp["school_experience"].get(client["school"], 0),
-            "priority": client["priority"],
-            "ma_availability": emp["availability"] == base_availability,
-            "mobility": emp["hasCar"],
-            "geschlecht_relevant": client["requiredSex"] != None,
-            "qualifications_met": all(
-                e in emp["qualifications"] for e in client["neededQualifications"]
-            ),
-            "availability_gap": availability_gap.days,
-        }
+        learner_dataset = {}
+        for i, j in pairs:
+            availability_gap = availability_gaps[i, j]
+            learner_dataset[(i, j)] = {
+                "timeToSchool": self.travel_times[i, j].item(),
+                "cl_experience": cl_experience[i].get(client_ids[j], 0),
+                "short_term_cl_experience": short_term_cl_experience[i].get(client_ids[j], 0),
+                "school_experience": school_experience[i].get(client_schools[j], 0),
+                "priority": priorities[j],
+                "ma_availability": ma_availability[i],
+                "mobility": mobility[i],
+                "geschlecht_relevant": sex_relevant[j],
+                # Only qualified pairs are admissible
+                "qualifications_met": True,
+                "availability_gap": None if np.isnan(availability_gap) else int(availability_gap),
+            }
+
+        return learner_dataset
+
+    def _add_availability_comments(self, pairs: List[Tuple[int, int]]) -> None:
+        """Comment the availability of every employee and client that has an admissible pair."""
+        for i in dict.fromkeys(i for i, _ in pairs):
+            emp = self.employees.iloc[i]
+            # convert emp["available_until"] to a human readable format, such as 01.01.2025
+            available_until_ma = (
+                datetime.strptime(emp["available_until"], "%Y-%m-%d")
+                if emp["available_until"] is not None
+                else "unbekannt"
+            )
+            add_employee_comment(emp["id"], f"Mitarbeiter frei bis: {available_until_ma}")
+
+        for j in dict.fromkeys(j for _, j in pairs):
+            client = self.clients.iloc[j]
+            available_until_client = (
+                datetime.strptime(client["available_until"], "%Y-%m-%d")
+                if client["available_until"] is not None
+                else "unbekannt"
+            )
+            add_customer_comment(
+                client["id"], f"Klient zu vertreten bis: {available_until_client}"
+            )
@@ -0,0 +1,121 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+from optimize.utils.eligibility import compute_travel_time_matrix
+from utils.day_ordinals import to_day_ordinals
+
+# Objective terms that are linear in the assignment variables, in column order
+# of the cost matrix. The sign states whether a high feature value is
+# penalized (+1) or rewarded (-1).
+cost_terms = {
+    "travel_time": 1,
+    "time_window": 1,
+    "priority": 1,
+    "client_experience": -1,
+    "school_experience": -1,
+    "short_term_client_experience": -1,
+    "availability_gap": -1,
+}
+
+
+def _experience_matrix(experiences: List[Dict], columns: Dict, n_clients: int) -> np.ndarray:
+    """Dense (n_employees, n_clients) matrix from per-employee {key: count} dicts."""
+    matrix = np.zeros((len(experiences), n_clients))
+    for i, experience in enumerate(experiences):
+        for key, count in experience.items():
+            key_columns = columns.get(key)
+            if key_columns:
+                matrix[i, key_columns] = count
+
+    return matrix
+
+
+def build_feature_matrices(
+    employees: pd.DataFrame, clients: pd.DataFrame, travel_times: np.ndarray = None
+) -> Dict[str, np.ndarray]:
+    """
+    Raw feature values of every employee-client pair as dense matrices.
+
+    Every matrix has shape (n_employees, n_clients). Values that are not
+    defined for a pair (no client time window, unknown availability) are NaN.
+
+    Args:
+        employees: MA features as created by aggregate_ma_features
+        clients: Client features as created by aggregate_client_features
+        travel_times: Optional precomputed travel time matrix (NaN = unreachable)
+    """
+    n_clients = len(clients)
+
+    if travel_times is None:
+        travel_times = compute_travel_time_matrix(employees, clients)
+
+    client_columns = defaultdict(list)
+    school_columns = defaultdict(list)
+    for j, (client_id, school) in enumerate(zip(clients["id"], clients["school"])):
+        client_columns[client_id].append(j)
+        school_columns[school].append(j)
+
+    availability_end = np.array(
+        [availability[1] for availability in employees["availability"]], dtype=float
+    )
+    time_window_end = np.array(
+        [np.nan if time_window is None else time_window[1] for time_window in clients["timeWindow"]],
+        dtype=float,
+    )
+
+    return {
+        # Unreachable schools count as zero distance, as in the original lookup
+        "travel_time": np.nan_to_num(travel_times, nan=0.0),
+        "time_window": availability_end[:, np.newaxis] - time_window_end[np.newaxis, :],
+        "priority": np.broadcast_to(
+            clients["priority"].to_numpy(dtype=float), (len(employees), n_clients)
+        ),
+        "client_experience": _experience_matrix(
+            employees["cl_experience"].tolist(), client_columns, n_clients
+        ),
+        "school_experience": _experience_matrix(
+            employees["school_experience"].tolist(), school_columns, n_clients
+        ),
+        "short_term_client_experience": _experience_matrix(
+            employees["short_term_cl_experience"].tolist(), client_columns, n_clients
+        ),
+        "availability_gap": (
+            to_day_ordinals(employees["available_until"])[:, np.newaxis]
+            - to_day_ordinals(clients["available_until"])[np.newaxis, :]
+        ),
+    }
+
+
+def build_cost_matrix(
+    feature_matrices: Dict[str, np.ndarray],
+    stats: Dict[str, Tuple[float, float]],
+    pairs: List[Tuple[int, int]],
+    scaling_factor: int,
+) -> np.ndarray:
+    """
+    Normalized and scaled integer coefficients for every pair and cost term.
+
+    Each feature is z-score normalized with the given (mean, std), multiplied
+    by the term's sign and the scaling factor and rounded to an integer.
+    Undefined values and features with zero std contribute 0.
+
+    Returns:
+        Integer matrix of shape (len(pairs), len(cost_terms))
+    """
+    cost_matrix = np.zeros((len(pairs), len(cost_terms)), dtype=np.int64)
+    if not pairs:
+        return cost_matrix
+
+    emp_idx, client_idx = (np.array(idx) for idx in zip(*pairs))
+
+    for k, (term, sign) in enumerate(cost_terms.items()):
+        mean, std = stats[term]
+        if not std > 0:
+            continue
+        values = feature_matrices[term][emp_idx, client_idx]
+        normalized = np.nan_to_num((values - mean) / std, nan=0.0)
+        cost_matrix[:, k] = np.rint(sign * normalized * scaling_factor)
+
+    return cost_matrix
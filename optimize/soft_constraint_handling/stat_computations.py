@@ -1,70 +1,41 @@
+from itertools import chain
+from typing import Dict, Iterable, Tuple
 import numpy as np
-from datetime import datetime
-import json
+import pandas as pd
 
-def compute_availability_gap_stats(employees, clients):
-    """Compute mean and standard deviation of availability gaps."""
-    availability_gaps = []
-    for i, employee in employees.iterrows():
-        for j, client in clients.iterrows():
-            availability_gap = (
-                datetime.strptime(employee["available_until"], "%Y-%m-%d") - datetime.strptime(client["available_until"], "%Y-%m-%d")
-            ).days
-            availability_gaps.append(availability_gap)
-    return np.mean(availability_gaps), (np.std(availability_gaps) if availability_gaps else (0, 1))
+def _mean_std(values: Iterable) -> Tuple[float, float]:
+    """Mean and standard deviation of all defined (non-NaN) values, (0, 1) if there are none."""
+    values = np.asarray(values, dtype=float).ravel()
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return 0, 1
+    return float(values.mean()), float(values.std())
 
-def compute_travel_time_stats(employees, clients):
-    """Compute mean and standard deviation of travel times for standardization."""
-    travel_times = []
-    for i, employee in employees.iterrows():
-        for j, client in clients.iterrows():
-            client_school = client["school"]
-            time_to_school = json.loads(employee["timeToSchool"]).get(
-                client_school, 0
-            )
-            travel_times.append(time_to_school)
-    return np.mean(travel_times), np.std(travel_times) if travel_times else (0, 1)
+def _dict_values(dicts: Iterable[Dict]) -> np.ndarray:
+    """All values of a column of {key: count} dicts as one flat array."""
+    return np.fromiter(chain.from_iterable(d.values() for d in dicts), dtype=float)
 
+def compute_feature_stats(employees: pd.DataFrame, clients: pd.DataFrame, feature_matrices: Dict[str, np.ndarray]) -> Dict[str, Tuple[float, float]]:
+    """
+    Compute mean and standard deviation of all features for standardization.
 
-def compute_short_term_client_experience_stats(employees):
-    """Compute mean and standard deviation of short term client experience scores."""
-    short_term_client_experience_scores = []
-    for i, ma in employees.iterrows():
-        short_term_client_experience_scores.extend(ma["short_term_cl_experience"].values())
-    
-    print(f"Short term client experience scores: {short_term_client_experience_scores}")
-    return (np.mean(short_term_client_experience_scores), (
-        np.std(short_term_client_experience_scores))) if short_term_client_experience_scores else (0, 1)
-    
-def compute_client_experience_stats(employees):
-    """Compute mean and standard deviation of client experience scores."""
-    client_experience_scores = []
-    for i, ma in employees.iterrows():
-        client_experience_scores.extend(ma["cl_experience"].values())
-    return (np.mean(client_experience_scores), (
-        np.std(client_experience_scores))) if client_experience_scores else (0, 1)
-    
-def compute_school_experience_stats(employees):
-    """Compute mean and standard deviation of school experience scores."""
-    school_experience_scores = []
-    for i, ma in employees.iterrows():
-        school_experience_scores.extend(ma["school_experience"].values())
-    return (np.mean(school_experience_scores), (
-        np.std(school_experience_scores))) if school_experience_scores else (0, 1)
+    Pair features are taken from the dense (n_employees, n_clients) matrices
+    built by build_feature_matrices, so no pair is visited in Python:
+    - travel_time: over all pairs, unreachable schools count as 0
+    - time_window: over all pairs whose client has a time window
+    - availability_gap: over all pairs with known availability (days)
+    Experience statistics are computed over the counts stored per MA and the
+    priority statistics over the clients.
 
-def compute_time_window_stats(employees, clients):
-    """Compute mean and standard deviation of time window differences."""
-    time_diffs = []
-    for i, employee in employees.iterrows():
-        for j, client in clients.iterrows():
-            client_time_window = client["timeWindow"]
-            if client_time_window:
-                client_time_end = client_time_window[1]
-                time_diff = employee["availability"][1] - client_time_end
-                time_diffs.append(time_diff)
-    return np.mean(time_diffs), np.std(time_diffs) if time_diffs else (0, 1)
-
-def compute_priority_stats(clients):
-    """Compute mean and standard deviation of client priority values."""
-    priorities = [client["priority"] for _, client in clients.iterrows()]
-    return np.mean(priorities), np.std(priorities) if priorities else (0, 1)
\ No newline at end of file
+    Returns:
+        Dictionary mapping each feature to its (mean, std)
+    """
+    return {
+        "travel_time": _mean_std(feature_matrices["travel_time"]),
+        "time_window": _mean_std(feature_matrices["time_window"]),
+        "priority": _mean_std(clients["priority"].to_numpy(dtype=float)),
+        "client_experience": _mean_std(_dict_values(employees["cl_experience"])),
+        "school_experience": _mean_std(_dict_values(employees["school_experience"])),
+        "short_term_client_experience": _mean_std(_dict_values(employees["short_term_cl_experience"])),
+        "availability_gap": _mean_std(feature_matrices["availability_gap"]),
+    }
@@ -0,0 +1,146 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ortools.sat.python import cp_model
+
+
+def configure_solver(
+    solver: cp_model.CpSolver,
+    time_limit: float = None,
+    num_workers: int = None,
+    relative_gap: float = None,
+) -> None:
+    """Apply the solve budget to the parameters of a CP-SAT solver."""
+    if time_limit is not None:
+        solver.parameters.max_time_in_seconds = float(time_limit)
+    if num_workers is not None:
+        solver.parameters.num_search_workers = int(num_workers)
+    if relative_gap is not None:
+        solver.parameters.relative_gap_limit = float(relative_gap)
+
+
+def get_solve_stats(solver: cp_model.CpSolver, status: int) -> Dict:
+    """Status and search statistics of the last solve of a CP-SAT solver."""
+    feasible = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+    return {
+        "status": solver.StatusName(status).lower(),
+        "wall_time": solver.WallTime(),
+        "branches": solver.NumBranches(),
+        "conflicts": solver.NumConflicts(),
+        "objective_value": solver.ObjectiveValue() if feasible else None,
+        "best_bound": solver.BestObjectiveBound() if feasible else None,
+    }
+
+
+class CpSatAssignmentModel:
+    """
+    The assignment model built directly with OR-Tools CP-SAT.
+
+    Contains the same variables, matching constraints and weighted objective
+    as the cpmpy model of the Optimizer, but without cpmpy expression trees
+    and their transformation: the objective is a single array-based
+    LinearExpr.WeightedSum over all assignment and unassigned variables.
+    Additional keyword arguments (time_limit, num_workers, relative_gap) set
+    the solve budget.
+    """
+
+    def __init__(
+        self,
+        pairs: List[Tuple[int, int]],
+        pair_costs: np.ndarray,
+        unassigned_cost: int,
+        n_employees: int,
+        n_clients: int,
+        **solve_budget,
+    ):
+        self.pairs = pairs
+        self.pair_position = {pair: k for k, pair in enumerate(pairs)}
+        self.model = cp_model.CpModel()
+
+        self.assignments = [
+            self.model.NewBoolVar(f"assign_E{i}_C{j}") for i, j in pairs
+        ]
+        self.unassigned_clients = [
+            self.model.NewBoolVar(f"unassigned_C{j}") for j in range(n_clients)
+        ]
+
+        employee_vars = [[] for _ in range(n_employees)]
+        client_vars = [[] for _ in range(n_clients)]
+        for (i, j), var in zip(pairs, self.assignments):
+            employee_vars[i].append(var)
+            client_vars[j].append(var)
+
+        # Every client is either assigned to exactly one employee or unassigned
+        for variables, unassigned_var in zip(client_vars, self.unassigned_clients):
+            self.model.AddExactlyOne(variables + [unassigned_var])
+
+        # Each employee can only be assigned to one client
+        for variables in employee_vars:
+            if len(variables) > 1:
+                self.model.AddAtMostOne(variables)
+
+        self.objective = cp_model.LinearExpr.WeightedSum(
+            self.assignments + self.unassigned_clients,
+            [int(cost) for cost in pair_costs] + [int(unassigned_cost)] * n_clients,
+        )
+        self.model.Minimize(self.objective)
+
+        self.solver = cp_model.CpSolver()
+        configure_solver(self.solver, **solve_budget)
+        self.status = None
+
+    def add_objective_bound(self, min_objective_value: int) -> None:
+        """Require the objective to exceed min_objective_value."""
+        self.model.Add(self.objective > min_objective_value)
+
+    def solve(
+        self,
+        hint_values: List[int] = None,
+        excluded_pairs: List[Tuple[int, int]] = (),
+        assigned_client: int = None,
+    ) -> Optional[Tuple[List[Tuple[int, int]], int]]:
+        """
+        Solve the model.
+
+        Args:
+            hint_values: Optional 0/1 value of every assignment variable
+            excluded_pairs: Pairs that must not be assigned in this solve
+            assigned_client: Optional index of a client that has to be assigned in this solve
+
+        Returns:
+            None if infeasible, otherwise the assigned pairs and the objective value
+        """
+        self.model.ClearHints()
+        if hint_values is not None:
+            hinted_clients = set()
+            for (_, j), var, value in zip(self.pairs, self.assignments, hint_values):
+                self.model.AddHint(var, value)
+                if value:
+                    hinted_clients.add(j)
+            for j, var in enumerate(self.unassigned_clients):
+                self.model.AddHint(var, int(j not in hinted_clients))
+
+        self.model.ClearAssumptions()
+        assumptions = [
+            self.assignments[self.pair_position[pair]].Not() for pair in excluded_pairs
+        ]
+        if assigned_client is not None:
+            assumptions.append(self.unassigned_clients[assigned_client].Not())
+        if assumptions:
+            self.model.AddAssumptions(assumptions)
+
+        self.status = self.solver.Solve(self.model)
+        if self.status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None
+
+        assigned_pairs = [
+            pair
+            for pair, var in zip(self.pairs, self.assignments)
+            if self.solver.BooleanValue(var)
+        ]
+
+        return assigned_pairs, int(self.solver.ObjectiveValue())
+
+    def get_solve_stats(self) -> Dict:
+        """Status and search statistics of the last solve."""
+        return get_solve_stats(self.solver, self.status)
@@ -0,0 +1,383 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import time
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from optimize.utils.cp_sat_model import CpSatAssignmentModel
+from optimize.utils.linear_assignment import solve_linear_assignment
+
+logger = logging.getLogger(__name__)
+
+
+def find_components(pairs: List[Tuple[int, int]], n_employees: int) -> List[Dict]:
+    """
+    Connected components of the bipartite eligibility graph.
+
+    Clients without any admissible pair do not belong to a component.
+
+    Returns:
+        List of components with the sorted global "employees" and "clients"
+        indices and the "pair_idx" positions of their pairs in pairs
+    """
+    if not pairs:
+        return []
+
+    emp_idx, client_idx = (np.array(idx) for idx in zip(*pairs))
+    n_clients = int(client_idx.max()) + 1
+    n_nodes = n_employees + n_clients
+    graph = coo_matrix(
+        (np.ones(len(pairs)), (emp_idx, n_employees + client_idx)),
+        shape=(n_nodes, n_nodes),
+    )
+    _, labels = connected_components(graph, directed=False)
+
+    pair_labels = labels[emp_idx]
+    components = []
+    for label in np.unique(pair_labels):
+        pair_idx = np.flatnonzero(pair_labels == label)
+        components.append(
+            {
+                "employees": np.unique(emp_idx[pair_idx]),
+                "clients": np.unique(client_idx[pair_idx]),
+                "pair_idx": pair_idx,
+            }
+        )
+
+    return components
+
+
+def solve_component(problem: Dict) -> Tuple[Optional[Tuple[List[Tuple[int, int]], int]], Dict]:
+    """
+    Solve the assignment problem of a single component in local indices.
+
+    Defined on module level so it can be sent to worker processes.
+
+    Returns:
+        The result of the backend (assigned local pairs and objective value or
+        None if infeasible) and the solve statistics
+    """
+    start = time.perf_counter()
+    args = (
+        problem["pairs"],
+        problem["pair_costs"],
+        problem["unassigned_cost"],
+        problem["n_employees"],
+        problem["n_clients"],
+    )
+
+    if problem["backend"] == "ortools":
+        model = CpSatAssignmentModel(*args, **problem["solve_budget"])
+        result = model.solve(
+            problem["hint_values"], problem["excluded_pairs"], problem["assigned_client"]
+        )
+        return result, model.get_solve_stats()
+
+    result = solve_linear_assignment(
+        *args, problem["excluded_pairs"], problem["assigned_client"]
+    )
+    # The Hungarian method always returns an optimal matching
+    stats = {
+        "status": "optimal" if result is not None else "infeasible",
+        "wall_time": time.perf_counter() - start,
+        "best_bound": result[1] if result is not None else None,
+    }
+    return result, stats
+
+
+def _solve_key(problem: Dict) -> Tuple:
+    """Key of a component solve, the hint only guides the search and is not part of it."""
+    return tuple(sorted(problem["excluded_pairs"])), problem["assigned_client"]
+
+
+class DecomposedAssignmentProblem:
+    """
+    The assignment problem split into independent regional components.
+
+    Eligibility requires the client's school to be within the commute radius
+    of the MA, so the MA-client eligibility graph usually falls apart into
+    disconnected components. The objective is a sum over components (plus the
+    penalty of clients without any admissible MA), so every component can be
+    solved as separate, small sub-model, optionally in a process pool.
+    Re-solves with exclusions for a single client only touch that client's
+    component and reuse the stored solutions of all other components.
+
+    Every solve of a component is cached. Given the MA and client ids and the
+    decomposition of a previous model (e.g. of the last polling iteration),
+    components with the same MAs, clients, pairs and costs take over its
+    cached solves and CP-SAT models, so only changed components are solved.
+    """
+
+    def __init__(
+        self,
+        pairs: List[Tuple[int, int]],
+        pair_costs: np.ndarray,
+        unassigned_cost: int,
+        n_employees: int,
+        n_clients: int,
+        backend: str = "auto",
+        max_workers: int = 1,
+        solve_budget: Dict = None,
+        employee_ids: List = None,
+        client_ids: List = None,
+        previous: "DecomposedAssignmentProblem" = None,
+    ):
+        self.pairs = pairs
+        self.pair_costs = np.asarray(pair_costs)
+        self.unassigned_cost = unassigned_cost
+        self.backend = backend
+        self.max_workers = max_workers
+        self.solve_budget = solve_budget or {}
+
+        self.components = find_components(pairs, n_employees)
+        self.client_component = {}
+        for c, component in enumerate(self.components):
+            for j in component["clients"].tolist():
+                self.client_component[j] = c
+
+        # Clients without admissible MA stay unassigned in every solution
+        self.isolated_clients_cost = (n_clients - len(self.client_component)) * unassigned_cost
+
+        self.component_results = []
+        self.component_stats = []
+        # CP-SAT models of the components solved in this process, reused by re-solves
+        self.component_models = {}
+        # Local result and statistics of every solve of a component, keyed
+        # by its local exclusions and assigned client
+        self.component_solves = [{} for _ in self.components]
+
+        self.component_keys = (
+            [self._component_key(component, employee_ids, client_ids) for component in self.components]
+            if employee_ids is not None and client_ids is not None
+            else None
+        )
+        if previous is not None:
+            self._take_over(previous)
+
+    def solve(
+        self,
+        hint_values: List[int] = None,
+        excluded_pairs: List[Tuple[int, int]] = (),
+    ) -> Tuple[Optional[Tuple[List[Tuple[int, int]], int]], Dict]:
+        """
+        Solve all components and merge their solutions.
+
+        Args:
+            hint_values: Optional 0/1 value of every pair, used by the CP-SAT backend
+            excluded_pairs: Pairs that must not be assigned in this solve
+
+        Returns:
+            The merged assigned pairs and objective value (None if a component
+            is infeasible) and the aggregated solve statistics
+        """
+        start = time.perf_counter()
+        problems = [
+            self._component_problem(component, hint_values, excluded_pairs)
+            for component in self.components
+        ]
+        unsolved = [
+            c for c, problem in enumerate(problems)
+            if _solve_key(problem) not in self.component_solves[c]
+        ]
+        if self.max_workers > 1 and len(unsolved) > 1:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                solved = list(executor.map(solve_component, [problems[c] for c in unsolved]))
+        else:
+            solved = [self._solve_local(c, problems[c]) for c in unsolved]
+        for c, output in zip(unsolved, solved):
+            self.component_solves[c][_solve_key(problems[c])] = output
+
+        outputs = [
+            self.component_solves[c][_solve_key(problem)] for c, problem in enumerate(problems)
+        ]
+        self.component_results = [
+            self._to_global(component, result)
+            for component, (result, _) in zip(self.components, outputs)
+        ]
+        self.component_stats = [stats for _, stats in outputs]
+
+        return self._merge(self.component_results), self._aggregate_stats(
+            [stats for _, stats in solved], self.component_stats, start
+        )
+
+    def resolve_for_client(
+        self,
+        excluded_pairs: List[Tuple[int, int]],
+        assigned_client: int,
+        hint_values: List[int] = None,
+    ) -> Tuple[Optional[Tuple[List[Tuple[int, int]], int]], Dict]:
+        """
+        Re-solve only the component of a client, keeping all other components' solutions.
+
+        Args:
+            excluded_pairs: Pairs of the client that must not be assigned
+            assigned_client: Index of the client that has to be assigned
+            hint_values: Optional 0/1 value of every pair, used by the CP-SAT backend
+        """
+        start = time.perf_counter()
+        c = self.client_component.get(assigned_client)
+        if c is None:
+            # The client has no admissible MA at all
+            return None, {"status": "infeasible"}
+
+        if not self.component_results:
+            # The other components need a solution to be merged with
+            self.solve(hint_values)
+
+        component = self.components[c]
+        problem = self._component_problem(component, hint_values, excluded_pairs, assigned_client)
+        key = _solve_key(problem)
+        solved = []
+        if key not in self.component_solves[c]:
+            self.component_solves[c][key] = self._solve_local(c, problem)
+            solved.append(self.component_solves[c][key][1])
+        result, stats = self.component_solves[c][key]
+        component_results = list(self.component_results)
+        component_results[c] = self._to_global(component, result)
+        component_stats = list(self.component_stats)
+        component_stats[c] = stats
+
+        return self._merge(component_results), self._aggregate_stats(
+            solved, component_stats, start
+        )
+
+    def _take_over(self, previous: "DecomposedAssignmentProblem") -> None:
+        """Take over the cached solves and CP-SAT models of the unchanged components of a previous problem."""
+        if self.component_keys is None or previous.component_keys is None:
+            return
+
+        previous_components = {key: c for c, key in enumerate(previous.component_keys)}
+        reused = 0
+        for c, key in enumerate(self.component_keys):
+            previous_c = previous_components.get(key)
+            if previous_c is None:
+                continue
+            self.component_solves[c] = previous.component_solves[previous_c]
+            if previous_c in previous.component_models:
+                self.component_models[c] = previous.component_models[previous_c]
+            reused += 1
+
+        logger.info(f"Reusing {reused} of {len(self.components)} components of the previous model")
+
+    def _component_key(self, component: Dict, employee_ids: List, client_ids: List) -> str:
+        """Hash of the MAs, clients, pairs and costs of a component, i.e. of its local problem."""
+        problem = self._component_problem(component)
+        content = [
+            [employee_ids[i] for i in component["employees"].tolist()],
+            [client_ids[j] for j in component["clients"].tolist()],
+            problem["pairs"],
+            problem["pair_costs"].tolist(),
+            problem["unassigned_cost"],
+            problem["backend"],
+            problem["solve_budget"],
+        ]
+
+        return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _solve_local(self, c: int, problem: Dict):
+        """Solve a component in this process, keeping its CP-SAT model for later re-solves."""
+        if problem["backend"] != "ortools":
+            return solve_component(problem)
+
+        if c not in self.component_models:
+            self.component_models[c] = CpSatAssignmentModel(
+                problem["pairs"],
+                problem["pair_costs"],
+                problem["unassigned_cost"],
+                problem["n_employees"],
+                problem["n_clients"],
+                **problem["solve_budget"],
+            )
+        model = self.component_models[c]
+        result = model.solve(
+            problem["hint_values"], problem["excluded_pairs"], problem["assigned_client"]
+        )
+        return result, model.get_solve_stats()
+
+    def _component_problem(
+        self, component: Dict, hint_values=None, excluded_pairs=(), assigned_client=None
+    ) -> Dict:
+        """Sub-problem of a component in local employee and client indices."""
+        local_employee = {i: k for k, i in enumerate(component["employees"].tolist())}
+        local_client = {j: k for k, j in enumerate(component["clients"].tolist())}
+        pairs = [self.pairs[p] for p in component["pair_idx"].tolist()]
+
+        return {
+            "backend": self.backend,
+            "pairs": [(local_employee[i], local_client[j]) for i, j in pairs],
+            "pair_costs": self.pair_costs[component["pair_idx"]],
+            "unassigned_cost": self.unassigned_cost,
+            "n_employees": len(local_employee),
+            "n_clients": len(local_client),
+            "hint_values": (
+                [hint_values[p] for p in component["pair_idx"].tolist()]
+                if hint_values is not None
+                else None
+            ),
+            "excluded_pairs": [
+                (local_employee[i], local_client[j])
+                for i, j in excluded_pairs
+                if i in local_employee and j in local_client
+            ],
+            "assigned_client": local_client.get(assigned_client),
+            "solve_budget": self.solve_budget,
+        }
+
+    def _to_global(self, component: Dict, result) -> Optional[Tuple[List[Tuple[int, int]], int]]:
+        if result is None:
+            return None
+        local_pairs, objective_value = result
+        employees = component["employees"]
+        clients = component["clients"]
+
+        return [(int(employees[i]), int(clients[j])) for i, j in local_pairs], objective_value
+
+    def _merge(self, component_results) -> Optional[Tuple[List[Tuple[int, int]], int]]:
+        if any(result is None for result in component_results):
+            return None
+        assigned_pairs = sorted(
+            pair for pairs, _ in component_results for pair in pairs
+        )
+        objective_value = self.isolated_clients_cost + sum(
+            objective_value for _, objective_value in component_results
+        )
+
+        return assigned_pairs, objective_value
+
+    def _aggregate_stats(self, stats_list: List[Dict], component_stats: List[Dict], start: float) -> Dict:
+        """
+        Statistics of a solve or re-solve.
+
+        Args:
+            stats_list: Statistics of the components solved in this call
+            component_stats: Statistics of the current solution of every
+                component, they make up the status and bound of the merged solution
+            start: perf_counter value at the start of the call
+        """
+        bounds = [stats.get("best_bound") for stats in component_stats]
+        statuses = {stats["status"] for stats in component_stats}
+        if not statuses or statuses == {"optimal"}:
+            status = "optimal"
+        elif statuses <= {"optimal", "feasible"}:
+            status = "feasible"
+        else:
+            status = "infeasible"
+
+        return {
+            "status": status,
+            "components": len(self.components),
+            "solved_components": len(stats_list),
+            # Elapsed time of the call, components may have been solved in parallel
+            "wall_time": time.perf_counter() - start,
+            "best_bound": (
+                self.isolated_clients_cost + sum(bounds)
+                if None not in bounds
+                else None
+            ),
+            "branches": sum(stats.get("branches", 0) for stats in stats_list),
+            "conflicts": sum(stats.get("conflicts", 0) for stats in stats_list),
+        }
@@ -0,0 +1,95 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import json
+import numpy as np
+import pandas as pd
+
+
+def compute_travel_time_matrix(employees: pd.DataFrame, clients: pd.DataFrame) -> np.ndarray:
+    """
+    Distance of every employee to the school of every client.
+
+    Each employee's "timeToSchool" JSON is parsed exactly once. Schools outside
+    of the commute radius (i.e. missing in "timeToSchool") are NaN.
+
+    Returns:
+        Float matrix of shape (n_employees, n_clients)
+    """
+    travel_times = np.full((len(employees), len(clients)), np.nan)
+
+    school_columns = defaultdict(list)
+    for j, school in enumerate(clients["school"]):
+        if school is not None:
+            school_columns[school].append(j)
+
+    for i, time_to_school in enumerate(employees["timeToSchool"]):
+        for school, distance in json.loads(time_to_school).items():
+            columns = school_columns.get(school)
+            if columns and distance is not None:
+                travel_times[i, columns] = distance
+
+    return travel_times
+
+
+def compute_qualification_mask(employees: pd.DataFrame, clients: pd.DataFrame) -> np.ndarray:
+    """
+    True where the employee has all qualifications the client needs.
+
+    Qualifications are encoded as bitmasks, so the check is a single
+    broadcasted bitwise operation instead of a list scan per pair.
+    """
+    qualification_bits: Dict[str, int] = {}
+
+    def to_bitmask(qualifications) -> int:
+        bitmask = 0
+        for qualification in qualifications or []:
+            if qualification not in qualification_bits:
+                qualification_bits[qualification] = 1 << len(qualification_bits)
+            bitmask |= qualification_bits[qualification]
+        return bitmask
+
+    client_bits = np.array([to_bitmask(q) for q in clients["neededQualifications"]], dtype=np.int64)
+    employee_bits = np.array([to_bitmask(q) for q in employees["qualifications"]], dtype=np.int64)
+
+    return (client_bits[np.newaxis, :] & ~employee_bits[:, np.newaxis]) == 0
+
+
+def compute_blacklist_mask(employees: pd.DataFrame, clients: pd.DataFrame) -> np.ndarray:
+    """True where the employee is on the blacklist of the client."""
+    blacklisted = np.zeros((len(employees), len(clients)), dtype=bool)
+    employee_ids = employees["id"].to_numpy()
+
+    if "ma_blacklist" not in clients:
+        return blacklisted
+
+    for j, blacklist in enumerate(clients["ma_blacklist"]):
+        if not blacklist:
+            continue
+        blacklisted[:, j] = np.isin(employee_ids, [elem["id"] for elem in blacklist])
+
+    return blacklisted
+
+
+def compute_eligibility(employees: pd.DataFrame, clients: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Combine school reachability, qualifications and blacklists into one mask.
+
+    Returns:
+        Tuple of the boolean eligibility mask and the travel time matrix,
+        both of shape (n_employees, n_clients)
+    """
+    travel_times = compute_travel_time_matrix(employees, clients)
+    eligible = (
+        ~np.isnan(travel_times)
+        & compute_qualification_mask(employees, clients)
+        & ~compute_blacklist_mask(employees, clients)
+    )
+
+    return eligible, travel_times
+
+
+def eligible_pairs(eligible: np.ndarray) -> List[Tuple[int, int]]:
+    """Admissible (employee, client) position pairs in row-major order."""
+    emp_idx, client_idx = np.nonzero(eligible)
+
+    return list(zip(emp_idx.tolist(), client_idx.tolist()))
@@ -0,0 +1,67 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+def solve_linear_assignment(
+    pairs: List[Tuple[int, int]],
+    pair_costs: np.ndarray,
+    unassigned_cost: int,
+    n_employees: int,
+    n_clients: int,
+    excluded_pairs: List[Tuple[int, int]] = (),
+    assigned_client: int = None,
+) -> Optional[Tuple[List[Tuple[int, int]], int]]:
+    """
+    Solve the assignment model as weighted bipartite matching (Hungarian method).
+
+    The model minimizes the sum of the pair costs of all assignments plus
+    unassigned_cost for every unassigned client, with every employee and every
+    client assigned at most once. Each client gets a dummy column ("unassigned")
+    with cost 0, while eligible pairs cost pair_cost - unassigned_cost, so the
+    matching objective differs from the model objective only by the constant
+    n_clients * unassigned_cost.
+
+    Args:
+        pairs: Admissible (employee index, client index) pairs
+        pair_costs: Integer objective coefficient of every pair
+        unassigned_cost: Penalty for every unassigned client
+        n_employees: Number of employees
+        n_clients: Number of clients
+        excluded_pairs: Pairs that must not be assigned
+        assigned_client: Optional index of a client that has to be assigned
+
+    Returns:
+        None if infeasible, otherwise the assigned pairs and the objective value
+    """
+    if n_clients == 0:
+        return [], 0
+
+    costs = np.full((n_clients, n_employees + n_clients), np.inf)
+    dummy_columns = n_employees + np.arange(n_clients)
+    costs[np.arange(n_clients), dummy_columns] = 0
+
+    if pairs:
+        emp_idx, client_idx = (np.array(idx) for idx in zip(*pairs))
+        costs[client_idx, emp_idx] = np.asarray(pair_costs, dtype=float) - unassigned_cost
+    for i, j in excluded_pairs:
+        costs[j, i] = np.inf
+    if assigned_client is not None:
+        costs[assigned_client, n_employees + assigned_client] = np.inf
+
+    try:
+        rows, columns = linear_sum_assignment(costs)
+    except ValueError:
+        # No complete assignment with finite costs exists
+        return None
+
+    pair_position = {pair: k for k, pair in enumerate(pairs)}
+    assigned_pairs = sorted(
+        (int(i), int(j)) for j, i in zip(rows, columns) if i < n_employees
+    )
+    objective_value = int(
+        sum(int(pair_costs[pair_position[pair]]) for pair in assigned_pairs)
+        + (n_clients - len(assigned_pairs)) * unassigned_cost
+    )
+
+    return assigned_pairs, objective_value
@@ -1,8 +1,7 @@
 import os
 from dotenv import load_dotenv
 from fetching.missy_fetching import fetch_date_objects_in_range
-from update_ma_client_history import process_data_for_date
-from utils.daterange import daterange
+from update_ma_client_history import process_date_range
 from config import base_url_missy
 from datetime import date, timedelta
 import json
@@ -24,5 +23,4 @@ if __name__ == "__main__":
     
     vertretungen = fetch_date_objects_in_range(request_info, endpoint_key, start_date, end_date)
     
-    for date in daterange(start_date, end_date):
-        process_data_for_date(request_info, vertretungen, date, OUTPUT_FILE)
\ No newline at end of file
+    process_date_range(request_info, vertretungen, start_date, end_date, OUTPUT_FILE)
\ No newline at end of file
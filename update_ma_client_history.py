@@ -1,13 +1,15 @@
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import List, Dict, Optional
 from pathlib import Path
 
 from fetching.missy_fetching import (
     get_clients
 )
+from data_processing.features_retrieval.retrieve_objects import index_objects_by_id
 from utils.daterange import daterange
 from utils.min_max_date import min_max_date
+from config import base_url_missy
 
 import os
 from dotenv import load_dotenv
@@ -57,89 +59,108 @@ def _process_entry_dates(entry: Dict) -> tuple[Optional[datetime.date], Optional
         print(f"Skipping entry with invalid dates: {entry}. Error: {e}")
         return None, None
 
-def _update_experience_maps(
-    ma_experience_map: Dict,
-    ma_school_experience_map: Dict,
+def _add_experience(
+    experience_map: Dict,
+    known_dates: Dict,
+    new_dates: Dict,
     ma_id: str,
-    client_id: str,
-    school_id: str,
-    target_date_str: str
+    key: str,
+    dates: List[str]
 ) -> None:
-    """Update both client and school experience maps for a given MA."""
-    # Initialize maps for new MA
-    if ma_id not in ma_experience_map:
-        ma_experience_map[ma_id] = {}
-    if ma_id not in ma_school_experience_map:
-        ma_school_experience_map[ma_id] = {}
-
-    # Update client experience
-    if client_id not in ma_experience_map[ma_id]:
-        ma_experience_map[ma_id][client_id] = []
-    if target_date_str not in ma_experience_map[ma_id][client_id]:
-        ma_experience_map[ma_id][client_id].append(target_date_str)
-        print(f"Added client assignment: MA {ma_id} with client {client_id} on {target_date_str}")
-
-    # Update school experience
-    if school_id not in ma_school_experience_map[ma_id]:
-        ma_school_experience_map[ma_id][school_id] = []
-    if target_date_str not in ma_school_experience_map[ma_id][school_id]:
-        ma_school_experience_map[ma_id][school_id].append(target_date_str)
-        print(f"Added school assignment: MA {ma_id} at school {school_id} on {target_date_str}")
-
-def process_data_for_date(request_info: List[Dict], data: List[Dict], target_date: datetime, output_path: str) -> None:
-    """Process assignments for a specific date and update experience logs."""
-    
+    """Collect the dates of an MA at a client or school that are not in the log yet."""
+    pair_known = known_dates.get((ma_id, key))
+    if pair_known is None:
+        pair_known = set(experience_map.get(ma_id, {}).get(key, []))
+        known_dates[(ma_id, key)] = pair_known
+    pair_new = new_dates.setdefault((ma_id, key), set())
+    for date_str in dates:
+        if date_str not in pair_known:
+            pair_new.add(date_str)
+
+def _append_new_dates(experience_map: Dict, new_dates: Dict) -> int:
+    """Append the collected dates in ascending order, returns the number of added dates."""
+    added = 0
+    for (ma_id, key), dates in new_dates.items():
+        if not dates:
+            continue
+        experience_map.setdefault(ma_id, {}).setdefault(key, []).extend(sorted(dates))
+        added += len(dates)
+    return added
+
+def process_date_range(request_info: List[Dict], data: List[Dict], start_date: date, end_date: date, output_path: str) -> None:
+    """
+    Add the assignments of all dates from start_date (inclusive) to end_date (exclusive) to the experience log.
+
+    The log and the clients are loaded once, the days of every assignment
+    are expanded from its startdatum/enddatum interval within the range,
+    new dates are deduplicated against the log with sets and appended, and
+    the log is written once.
+    """
     clients = get_clients(request_info, use_cache=True)
-    
-    date_str = target_date.strftime("%Y-%m-%d")
-    print(f"Processing assignments for date: {date_str}")
+    clients_by_id = index_objects_by_id(clients)
+
+    print(f"Processing assignments from {start_date} to {end_date}")
     experience_list = load_json_file(output_path)
     ma_experience_map, ma_school_experience_map = _initialize_experience_maps(experience_list)
+    known_client_dates, known_school_dates = {}, {}
+    new_client_dates, new_school_dates = {}, {}
 
     for entry in data:
         start, end = _process_entry_dates(entry)
-        if not start or not end or not (start <= target_date <= end):
+        if not start or not end:
             continue
 
         ma_vertretend = entry.get("mavertretend")
         if not ma_vertretend:
             continue
-            
+
+        # Days of the assignment within the range
+        dates = [
+            day.strftime("%Y-%m-%d")
+            for day in daterange(max(start, start_date), min(end + timedelta(days=1), end_date))
+        ]
+        if not dates:
+            continue
+
         ma_id = ma_vertretend["id"]
         client_id = entry["klientzubegleiten"]["id"]
-        client_object = next((client for client in clients if client["id"] == client_id), None)
-        
+        client_object = clients_by_id.get(client_id)
+
         if not client_object:
             print(f"Warning: Client {client_id} not found in clients list")
             continue
-            
+
         school_id = client_object["schule"]["id"]
 
-        _update_experience_maps(
-            ma_experience_map,
-            ma_school_experience_map,
-            ma_id,
-            client_id,
-            school_id,
-            date_str
-        )
+        _add_experience(ma_experience_map, known_client_dates, new_client_dates, ma_id, client_id, dates)
+        _add_experience(ma_school_experience_map, known_school_dates, new_school_dates, ma_id, school_id, dates)
+
+    added_client_dates = _append_new_dates(ma_experience_map, new_client_dates)
+    added_school_dates = _append_new_dates(ma_school_experience_map, new_school_dates)
+    print(f"Added {added_client_dates} client and {added_school_dates} school assignment dates")
 
     # Rebuild and save the experience list
     updated_experience_list = [
         {
             "ma": ma_id,
-            "client_experience": ma_experience_map[ma_id],
-            "school_experience": ma_school_experience_map[ma_id]
+            "client_experience": ma_experience_map.get(ma_id, {}),
+            "school_experience": ma_school_experience_map.get(ma_id, {})
         }
-        for ma_id in set(ma_experience_map.keys()) | set(ma_school_experience_map.keys())
+        for ma_id in dict.fromkeys(list(ma_experience_map) + list(ma_school_experience_map))
     ]
     save_json_file(output_path, updated_experience_list)
 
+def process_data_for_date(request_info: List[Dict], data: List[Dict], target_date: date, output_path: str) -> None:
+    """Process assignments for a specific date and update experience logs."""
+    process_date_range(request_info, data, target_date, target_date + timedelta(days=1), output_path)
+
 if __name__ == "__main__":
+    request_specs = json.loads(os.getenv("REQUEST_INFO"))
+    request_info = [{'user': spec['user'], 'pw': spec['pw'], 'url': base_url_missy.format(domain=spec['domain'])} for spec in request_specs]
+
     input_data = load_json_file(INPUT_FILE)
     min_date, max_date = min_max_date(input_data)
-    for date in daterange(min_date, max_date + timedelta(days=1)):
-        process_data_for_date(input_data, date, OUTPUT_FILE)
+    process_date_range(request_info, input_data, min_date, max_date + timedelta(days=1), OUTPUT_FILE)
         
     # Schedule the function to run daily at 10 PM
     # schedule.every().day.at("22:00").do(process_data_for_date, input_data, date, OUTPUT_FILE)
@@ -147,4 +168,3 @@ if __name__ == "__main__":
     # while True:
     #     schedule.run_pending()
     #     time.sleep(6000)
-    
\ No newline at end of file
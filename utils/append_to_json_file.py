@@ -1,35 +1,14 @@
-import json
-import os
-from datetime import datetime
-
-from config import log_store
+from utils.jsonl_log import append_to_log
 
 def append_to_json_file(obj, file_name):
     """
-    Appends a given Python object to a JSON file, using the current timestamp as the key.
-    
+    Appends a given Python object to the log of a store file, using the current timestamp as the key.
+
+    The entry is appended as one line to store/<name>.jsonl instead of
+    rewriting the whole JSON file, read it back with utils.jsonl_log.read_log.
+
     Parameters:
         obj (any): The Python object to store (must be JSON serializable).
-        file_name (str): Path to the JSON file where the data should be stored.
+        file_name (str): Name of the store file, e.g. "recommendations.json".
     """
-    timestamp = datetime.now().isoformat()  # Generate timestamp key
-    file_path = f"{log_store}/{file_name}"
-
-    # Load existing data if the file exists
-    if os.path.exists(file_path):
-        with open(file_path, "r") as file:
-            try:
-                data = json.load(file)
-            except json.JSONDecodeError:
-                data = {}  # Handle empty or corrupted files
-    else:
-        data = {}
-
-    # Append new data with timestamp key
-    data[timestamp] = obj
-
-    # Save updated data back to the file
-    with open(file_path, "w") as file:
-        json.dump(data, file, indent=4)
-
-    return timestamp  # Return the timestamp for reference
\ No newline at end of file
+    return append_to_log(obj, file_name)  # Return the timestamp for reference
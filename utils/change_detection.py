@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Fields of a VMBegleitung record that are used to build the optimization dataset
+relevant_record_fields = [
+    "klientzubegleiten",
+    "maabwesend",
+    "mavertretend",
+    "klientabwesend",
+    "mafrei",
+    "startdatum",
+    "enddatum",
+    "mavorschlagblacklist",
+]
+
+
+def record_key(record: Dict) -> Tuple[Any, Any]:
+    """Identify an incident record across polls by its organisation and id."""
+    return record.get("org"), record.get("id")
+
+
+def record_fingerprint(record: Dict) -> str:
+    """Stable hash of the relevant fields of an incident record."""
+    relevant = {field: record.get(field) for field in relevant_record_fields}
+
+    return hashlib.sha1(
+        json.dumps(relevant, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def compute_delta(old_fingerprints: Dict, new_fingerprints: Dict) -> Dict[str, List]:
+    """
+    Compare the record fingerprints of two polls.
+
+    Returns:
+        Dictionary with the keys of the "added", "removed" and "modified" records
+    """
+    return {
+        "added": [key for key in new_fingerprints if key not in old_fingerprints],
+        "removed": [key for key in old_fingerprints if key not in new_fingerprints],
+        "modified": [
+            key
+            for key, fingerprint in new_fingerprints.items()
+            if key in old_fingerprints and old_fingerprints[key] != fingerprint
+        ],
+    }
+
+
+def has_changes(delta: Dict[str, List]) -> bool:
+    return any(delta.values())
+
+
+class ChangeDetector:
+    """
+    Detects which incident records changed between two polls.
+
+    Every record is fingerprinted by its relevant fields, so changes to other
+    fields do not trigger a new optimization. The per-poll deltas are logged
+    and summed up per hour to monitor the churn rate.
+    """
+
+    def __init__(self):
+        self.fingerprints = {}
+        self.scope = None
+        self.churn_hour = None
+        self.hourly_churn = Counter()
+
+    def update(self, records: List[Dict], scope: Any = None) -> Dict[str, List]:
+        """
+        Fingerprint the records of a new poll and return the delta to the previous one.
+
+        Args:
+            records: The incident records of the poll
+            scope: Context of the records (e.g. the relevant date); if it
+                changes, all records count as added
+        """
+        if scope != self.scope:
+            self.fingerprints = {}
+            self.scope = scope
+
+        new_fingerprints = {record_key(record): record_fingerprint(record) for record in records}
+        delta = compute_delta(self.fingerprints, new_fingerprints)
+        self.fingerprints = new_fingerprints
+
+        self._log_churn(delta)
+
+        return delta
+
+    def _log_churn(self, delta: Dict[str, List]) -> None:
+        hour = datetime.now().strftime("%Y-%m-%d %H:00")
+        if hour != self.churn_hour:
+            if self.churn_hour is not None:
+                logger.info(f"Record churn {self.churn_hour}: {dict(self.hourly_churn)}")
+            self.churn_hour = hour
+            self.hourly_churn = Counter()
+
+        self.hourly_churn["polls"] += 1
+        for change, keys in delta.items():
+            self.hourly_churn[change] += len(keys)
+
+        if has_changes(delta):
+            logger.info(
+                "Record delta: "
+                + ", ".join(f"{change} {[key[1] for key in keys]}" for change, keys in delta.items())
+            )
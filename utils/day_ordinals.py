@@ -0,0 +1,22 @@
+from datetime import datetime, date
+from typing import Iterable
+import numpy as np
+
+def to_day_ordinals(dates: Iterable) -> np.ndarray:
+    '''
+    Convert dates (either "%Y-%m-%d" strings or date/datetime objects) into
+    proleptic Gregorian day ordinals. Missing dates become NaN so that
+    differences between two ordinal arrays are NaN whenever one side is unknown.
+    '''
+    ordinals = []
+    for value in dates:
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            ordinals.append(np.nan)
+        elif isinstance(value, str):
+            ordinals.append(datetime.strptime(value, "%Y-%m-%d").toordinal())
+        elif isinstance(value, (datetime, date)):
+            ordinals.append(value.toordinal())
+        else:
+            ordinals.append(np.nan)
+
+    return np.array(ordinals, dtype=float)
@@ -0,0 +1,11 @@
+import hashlib
+
+
+def file_fingerprint(path: str) -> str:
+    """sha1 hash of the content of a file, read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
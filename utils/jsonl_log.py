@@ -0,0 +1,110 @@
+import glob
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Any, Iterator, Tuple
+
+from config import log_store, log_rotate_bytes, log_compress_rotated
+
+
+def log_path(file_name: str) -> str:
+    """Path of the JSON Lines log of a store file name, e.g. recommendations.json -> store/recommendations.jsonl."""
+    stem = os.path.splitext(file_name)[0]
+    return f"{log_store}/{stem}.jsonl"
+
+
+def append_to_log(obj: Any, file_name: str) -> str:
+    """
+    Append an object as one line {"timestamp": ..., "data": obj} to the log of file_name.
+
+    Only the new line is written, independent of the size of the log. Once
+    the log exceeds log_rotate_bytes, it is rotated to
+    <stem>.<timestamp>.jsonl (gzip compressed if log_compress_rotated).
+
+    Returns:
+        The timestamp of the entry
+    """
+    timestamp = datetime.now().isoformat()
+    path = log_path(file_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    line = json.dumps({"timestamp": timestamp, "data": obj}, default=str)
+    with open(path, "a") as file:
+        file.write(line + "\n")
+
+    if log_rotate_bytes and os.path.getsize(path) > log_rotate_bytes:
+        rotate_log(path)
+
+    return timestamp
+
+
+def rotate_log(path: str) -> str:
+    """Move the current log aside, named by the time of the rotation (after its last entry)."""
+    stem = os.path.splitext(path)[0]
+    rotated_path = f"{stem}.{datetime.now().strftime('%Y%m%dT%H%M%S%f')}.jsonl"
+    os.replace(path, rotated_path)
+
+    if log_compress_rotated:
+        with open(rotated_path, "rb") as source, gzip.open(f"{rotated_path}.gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(rotated_path)
+        rotated_path = f"{rotated_path}.gz"
+
+    return rotated_path
+
+
+def read_log(file_name: str, since: str = None, until: str = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Stream the (timestamp, object) entries of a log in chronological order.
+
+    Reads the legacy store/<file_name> JSON dict (if it still exists), the
+    rotated logs and the current log, one entry at a time. Rotated logs
+    that ended before since are skipped without being opened.
+
+    Args:
+        file_name: Store file name as passed to append_to_log
+        since: Optional ISO timestamp, earlier entries are skipped
+        until: Optional ISO timestamp, later entries are skipped
+    """
+    legacy_path = f"{log_store}/{file_name}"
+    if os.path.splitext(file_name)[1] == ".json" and os.path.exists(legacy_path):
+        with open(legacy_path, "r") as file:
+            try:
+                legacy_data = json.load(file)
+            except json.JSONDecodeError:
+                legacy_data = {}
+        for timestamp, obj in sorted(legacy_data.items()):
+            if _in_range(timestamp, since, until):
+                yield timestamp, obj
+
+    path = log_path(file_name)
+    stem = os.path.splitext(path)[0]
+    for rotated_path in sorted(glob.glob(f"{glob.escape(stem)}.*.jsonl*")):
+        rotated_at = os.path.basename(rotated_path)[len(os.path.basename(stem)) + 1:].split(".")[0]
+        if since and datetime.strptime(rotated_at, "%Y%m%dT%H%M%S%f").isoformat() < since:
+            continue
+        yield from _read_lines(rotated_path, since, until)
+
+    if os.path.exists(path):
+        yield from _read_lines(path, since, until)
+
+
+def _read_lines(path: str, since: str = None, until: str = None) -> Iterator[Tuple[str, Any]]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Incomplete last line of an interrupted write
+                continue
+            if _in_range(entry["timestamp"], since, until):
+                yield entry["timestamp"], entry["data"]
+
+
+def _in_range(timestamp: str, since: str = None, until: str = None) -> bool:
+    return (since is None or timestamp >= since) and (until is None or timestamp <= until)
@@ -0,0 +1,54 @@
+import hashlib
+import json
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from fetching.ai_communication import build_payload
+
+logger = logging.getLogger(__name__)
+
+
+def payload_digest(update: Dict) -> str:
+    """Stable hash of the payload an update would PUT to the web service."""
+    payload = build_payload(update["id"], update["recommendations"])
+
+    return hashlib.sha1(
+        json.dumps(payload, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class PushCache:
+    """
+    Remembers the payload digest of the last successful push per incident.
+
+    Updates whose payload (recommended MAs and explanations) is identical
+    to the last pushed one are skipped, so unchanged recommendations are
+    not sent again on every iteration.
+    """
+
+    def __init__(self):
+        self.digests: Dict[tuple, str] = {}
+
+    def filter_changed(self, updates: List[Dict]) -> List[Dict]:
+        """Return the updates whose payload differs from the last push of their incident."""
+        changed = [
+            update
+            for update in updates
+            if self.digests.get((update["org"], update["id"])) != payload_digest(update)
+        ]
+        logger.info(f"{len(changed)} of {len(updates)} recommendation updates changed")
+
+        return changed
+
+    def mark_pushed(self, updates: List[Dict], outs: List[Optional[str]]) -> None:
+        """Store the digests of the updates that were pushed successfully."""
+        for update, out in zip(updates, outs):
+            if out is not None:
+                self.digests[(update["org"], update["id"])] = payload_digest(update)
+
+    def retain(self, incident_keys: Iterable[tuple]) -> None:
+        """Forget incidents that are no longer open, so they are pushed again if they reappear."""
+        incident_keys = set(incident_keys)
+        self.digests = {
+            key: digest for key, digest in self.digests.items() if key in incident_keys
+        }
@@ -1,23 +1,30 @@
+import logging
 from typing import List, Tuple, Dict
 from utils.create_explanations import create_explanation, create_short_explanation
-from fetching.ai_communication import update_recommendation
+from fetching.ai_communication import update_recommendation, update_recommendations
+from utils.push_cache import PushCache
+from config import push_batch_size
 
-def send_update(
-    request_info: List[Dict[str, str]],
+logger = logging.getLogger(__name__)
+
+def create_update(
     assigned_pairs: List[List],
     recommendation_ids: List[str],
     client_record_assignments: Dict[str, Dict],
-) -> Dict:
+) -> Tuple[Dict, Tuple]:
 
     '''
-    Send the update to the AI assistant
+    Build the update of an incident from its ranked candidate pairs
+
+    Returns:
+        The update ({"id", "recommendations", "org"}) and the recommendation record
     '''
     client_id = None
 
     ma_ids = []
     expl_shorts = []
     expls = []
-    
+
     incident_ids = []
     orgs = []
     recommended_ma_ids = []
@@ -44,11 +51,74 @@ def send_update(
         recommended_expl_shorts.append(expl_short)
         recommended_expls.append(expl)
         recommended_client_ids.append(client_id)
+    update = {
+        "id": incident_id,
+        "recommendations": list(zip(ma_ids, expl_shorts, expls)),
+        "org": org,
+    }
+    return update, (incident_ids, orgs, recommended_ma_ids, recommended_expl_shorts, recommended_expls, recommended_client_ids)
+
+
+def send_update(
+    request_info: List[Dict[str, str]],
+    assigned_pairs: List[List],
+    recommendation_ids: List[str],
+    client_record_assignments: Dict[str, Dict],
+) -> Dict:
+
+    '''
+    Send the update to the AI assistant
+    '''
+    update, recommendation = create_update(
+        assigned_pairs, recommendation_ids, client_record_assignments
+    )
     out = update_recommendation(
-        request_info, incident_id, list(zip(ma_ids, expl_shorts, expls)), org
+        request_info, update["id"], update["recommendations"], update["org"]
     )
     print(out)
-    return incident_ids, orgs, recommended_ma_ids, recommended_expl_shorts, recommended_expls, recommended_client_ids
+    return recommendation
+
+
+def send_updates(
+    request_info: List[Dict[str, str]],
+    assigned_pairs_per_incident: List[List],
+    recommendation_ids: List[str],
+    client_record_assignments: Dict[str, Dict],
+    push_cache: PushCache = None,
+) -> List:
+
+    '''
+    Send the updates of all incidents to the AI assistant, pushing them concurrently
+    in batches of push_batch_size. With a push cache, incidents whose payload did not
+    change since their last successful push are skipped.
+    '''
+    updates = []
+    recommendations = []
+    for assigned_pairs in assigned_pairs_per_incident:
+        try:
+            update, recommendation = create_update(
+                assigned_pairs, recommendation_ids, client_record_assignments
+            )
+        except Exception as e:
+            logger.error(f"Error while creating update: {e}")
+            continue
+        updates.append(update)
+        recommendations.append(recommendation)
+
+    if push_cache is not None:
+        push_cache.retain(
+            (record["org"], record["id"]) for record in client_record_assignments.values()
+        )
+        updates = push_cache.filter_changed(updates)
+
+    for start in range(0, len(updates), push_batch_size):
+        batch = updates[start:start + push_batch_size]
+        outs = update_recommendations(request_info, batch)
+        logger.debug(f"Pushed batch: {outs}")
+        if push_cache is not None:
+            push_cache.mark_pushed(batch, outs)
+
+    return recommendations
 
 
 def send_empty_update(request_info: List[Dict[str, str]], incident_id: str, org: str):